@@ -16,126 +16,163 @@
 #
 import random
 import math
+import time
 import os.path
-from functions import du_lj, per_dist, displacement_advanced
+import numpy as np
+from arguments import sampler_arguments
+from functions import u_lj, du_lj, per_dist, walker_tables, move_particle, potential_table, table_du, epsilon
+from functions import sigma as sigma_lj
+from vectorized import displacement_advanced_array
+from cell_tables import table_filename, load_tables, save_tables, symmetric_cells, table_wedge
+from cell_tables import diff_rate_bound, sampled_diff_rate
+from histograms import histogram_edges, histogram_bin, histogram_filename, save_histogram, n_bins
+from histograms import snapshot_edges, snapshot_counts, bins_below
+from checkpoint import load_conf, save_conf, load_checkpoint, save_checkpoint, remove_checkpoint
+from checkpoint import checkpoint_filename, replica_filename, save_replica
+from checkpoint import flat_cells, nested_cells
+from instrumentation import lap, count, save_profile
+from tuning import tuned_parameters
 
-N = 100
-density = 0.05
+# N, density, n_chains, the random seed, the file of the profile of the event loop, the number of cells per side, the
+# chain length and the tolerance of the tabulated potential can be given on the command line (see arguments.py)
+args = sampler_arguments('non-reversible cell-veto algorithm', N=100, density=0.05, n_steps=10 ** 2, unit='chains',
+                         profile=True, tabulated=True, cells=True, chain_length=True)
+profile = args.profile is not None  # if True, the phases of the event loop are timed (see instrumentation.py)
+N = args.N
+density = args.density
+random.seed(args.seed)
 L = math.sqrt(N / density)
 directions = [[1.0, 0.0], [0.0, 1.0]]
-chain_length = 40.0
+# tabulated potential, from half the diameter of the particles to the largest distance in the box (u_lj if None). The
+# displacements and the real rejection rates of the cell vetoes are computed with it, and the differential cell rates
+# (bounds of |du_lj| over the distances between the cells, at most 0.5 outside of the neighbor cells, where the error of
+# the tabulated derivative is at most its tolerance) are increased by the tolerance, so that they remain bounds.
+table = None
+if args.tabulated is not None:
+    table = potential_table(u_lj, du_lj, 0.5 * sigma_lj, 2 ** (1 / 6) * sigma_lj, L / math.sqrt(2.0), args.tabulated)
+# number of cells per side and chain length: given on the command line, chosen by autotune.py (see tuning.py), or 67
+# and 40.0
+parameters = tuned_parameters('ECCellVeto', N, density, {'n': 67, 'chain_length': 40.0})
+n = args.n if args.n is not None else parameters['n']
+chain_length = args.chain_length if args.chain_length is not None else parameters['chain_length']
 
-# generating the differential cell rates
-n = 67
+# generating the differential cell rates and the Walker tables, unless they are stored in CellTables/ for the same
+# parameters
 n_cells = n ** 2
 cell_size = L / n
-neighbor_indices = [(i % n) + n * (j % n) for i in [-1, 0, 1] for j in [-1, 0, 1]]
+analytic_bounds = True  # if False, the rates are estimated from n_trials random positions, with a safety factor 5
 n_trials = 10 ** 3
-diff_rates = []
-for k in range(n):
-    print("Row number " + str(k))
-    for j in range(n):
-        if j + n * k in neighbor_indices:
-            diff_rates.append(0.0)
-        else:
-            x_active = [[random.uniform(0, cell_size), random.uniform(0, cell_size)] for n in range(n_trials)]
-            x_target = [[random.uniform(j * cell_size, (j + 1) * cell_size),
-                         random.uniform(k * cell_size, (k + 1) * cell_size)] for m in range(n_trials)]
-            distances = [per_dist(x, y, L) for x, y in zip(x_active, x_target)]
-            if 5.0 * max([abs(du_lj(r)) for r in distances]) > 0.5:
-                diff_rates.append(0.0)
-                neighbor_indices.append(j + n * k)
+n_processes = args.n_processes  # number of processes estimating the rates from random positions
+table_file = table_filename('ECCellVeto', N, density, n)
+table_parameters = {'N': N, 'density': density, 'n': n, 'analytic_bounds': analytic_bounds, 'n_trials': n_trials,
+                    'sigma': sigma_lj, 'epsilon': epsilon, 'tabulated': args.tabulated or 0.0}
+tables = load_tables(table_file, table_parameters)
+if tables is None:
+    neighbor_indices = [(i % n) + n * (j % n) for i in [-1, 0, 1] for j in [-1, 0, 1]]
+    diff_rates = [0.0] * n_cells
+    # the rates are only computed for j <= k <= n / 2, the other cells follow from the symmetries of the lattice
+    if analytic_bounds:
+        rows = table_wedge(diff_rate_bound, n, (cell_size, L))
+    else:
+        rows = table_wedge(sampled_diff_rate, n, (cell_size, L, n_trials), n_processes, sampled=True)
+    for k in range(n // 2 + 1):
+        for j in range(k + 1):
+            if j + n * k in neighbor_indices:
+                continue
+            diff_rate = rows[k][j]
+            if diff_rate > 0.5:
+                neighbor_indices.extend(symmetric_cells(j, k, n))
             else:
-                diff_rates.append(5.0 * max([abs(du_lj(r)) for r in distances]))
+                for cell in symmetric_cells(j, k, n):
+                    diff_rates[cell] = diff_rate + (args.tabulated or 0.0)
 
-# generating Walker tables
+    # generating Walker tables
+    [prob_table, alias_table] = walker_tables(diff_rates)
+    save_tables(table_file, table_parameters, diff_rates, neighbor_indices, prob_table, alias_table)
+else:
+    [diff_rates, neighbor_indices, prob_table, alias_table] = tables
 Q = sum(diff_rates)
-q_probs = [q / Q for q in diff_rates]
-n_q = len(q_probs)
-prob_table = [n_q * q for q in q_probs]
-alias_table = [k for k in range(n_q)]
-over = []
-under = []
-for s in range(n_q):
-    if prob_table[s] > 1.0:
-        over.append(s)
-    elif prob_table[s] < 1.0:
-        under.append(s)
-count = 0
-while over and under:
-    print(count)
-    count += 1
-    i = random.choice(over)
-    j = random.choice(under)
-    alias_table[j] = i
-    under.remove(j)
-    prob_table[i] += prob_table[j] - 1.0
-    if prob_table[i] <= 1.0:
-        over.remove(i)
-    if prob_table[i] < 1.0:
-        under.append(i)
+n_q = len(diff_rates)
 
 # initial configuration
-filename = 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.data'
-if os.path.isfile(filename):
-    with open(filename, 'r') as file:
-        conf = [list(c) for c in eval(file.readline())]
-        particle_cells = {cell: [] for cell in range(n_cells)}
-        surplus_cells = []
-        for c in conf:
-            cell = int(c[0] / cell_size) + n * int(c[1] / cell_size)
-            particle_cells[cell].append(c)
-            if len(particle_cells[cell]) > 1 and cell not in surplus_cells:
-                surplus_cells.append(cell)
-else:
-    conf = []
-    particle_cells = {cell: [] for cell in range(n_cells)}
-    r = int(n_cells / N)
+conf = load_conf(N, density)
+if conf is None:
+    conf = np.zeros((N, 2))
+    # the particles are spread over the cells with a stride r (several particles per cell if n_cells < N)
+    r = max(n_cells // N, 1)
     for j in range(N):
-        [n_x, n_y] = [(r * j) % n, int((r * j) / n)]
-        x = random.uniform(n_x * cell_size, (n_x + 1) * cell_size)
-        y = random.uniform(n_y * cell_size, (n_y + 1) * cell_size)
-        conf.append([x, y])
-        particle_cells[(r * j)].append([x, y])
-    surplus_cells = []
+        [n_x, n_y] = [(r * j) % n, (r * j) % n_cells // n]
+        conf[j] = [random.uniform(n_x * cell_size, (n_x + 1) * cell_size),
+                   random.uniform(n_y * cell_size, (n_y + 1) * cell_size)]
+# absolute indices of the neighbor cells of each cell
+cell_neighbors = [[(cell % n + k % n) % n + n * ((int(cell / n) + int(k / n)) % n) for k in neighbor_indices]
+                  for cell in range(n_cells)]
 
-# sampling
-n_chains = 10 ** 2
-u_evals = 0
-distance = 0.0
-pair_correlations = []
-for chain in range(n_chains):
+# sampling (an interrupted run is resumed from its last checkpoint, written every checkpoint_interval chains)
+n_chains = args.n_chains
+checkpoint_interval = 10 ** 3
+checkpoint_file = checkpoint_filename('ECCellVeto', N, density, args.replica)
+# every snapshot_interval chains, the distances between all the pairs closer than r_snapshot are added to the
+# snapshot histogram
+snapshot_interval = 1
+r_snapshot = 5.0 * sigma_lj
+if os.path.isfile(checkpoint_file):
+    state = load_checkpoint(checkpoint_file)
+    [conf, first_chain, u_evals, distance] = [state['conf'], state['chain'], state['u_evals'], state['distance']]
+    particle_cells = nested_cells(state['cell_particles'], state['cell_counts'])
+    if len(particle_cells) != n_cells:
+        raise ValueError(checkpoint_file + ' was written with a different number of cells per side')
+    [pair_counts, snapshot_pair_counts] = [state['pair_counts'], state['snapshot_pair_counts']]
+else:
+    # particles are identified by their index in conf, and each cell keeps the list of the particles it contains
+    particle_cells = [[] for cell in range(n_cells)]
+    for j in range(N):
+        particle_cells[int(conf[j][0] / cell_size) % n + n * (int(conf[j][1] / cell_size) % n)].append(j)
+    [first_chain, u_evals, distance] = [0, 0, 0.0]
+    pair_counts = np.zeros(n_bins, dtype=np.int64)
+    snapshot_pair_counts = np.zeros(bins_below(r_snapshot, L), dtype=np.int64)
+surplus_particles = {particle for particles in particle_cells for particle in particles[1:]}
+[start_time, start_evals] = [time.perf_counter(), u_evals]
+for chain in range(first_chain, n_chains):
     print(chain)
     sigma = random.choice(directions)
-    part = random.choice(conf)
+    i = random.randint(0, N - 1)
     current_length = 0.0
     while True:
-        active_cell = int(part[0] / cell_size) + n * int(part[1] / cell_size)
-        # identifying neighbor cells and neighbor particles
-        neighbor_cells = [(active_cell % n + k % n) % n + n * ((int(active_cell / n) + int(k / n)) % n)
-                          for k in neighbor_indices]
+        if profile:
+            clock = time.perf_counter()
+            count('events')
+        part = conf[i]
+        active_cell = int(part[0] / cell_size) % n + n * (int(part[1] / cell_size) % n)
+        # identifying neighbor particles
         neighbor_particles = []
-        for n_cell in neighbor_cells:
-            possible_neighbors = [particle for particle in particle_cells[n_cell] if particle != part]
-            if possible_neighbors:
-                neighbor_particles.extend(possible_neighbors[0:])
-        # identifying surplus particles
-        surplus_particles = []
-        for s_cell in surplus_cells:
-            if s_cell not in neighbor_cells:
-                surplus_particles.extend(particle_cells[s_cell][1:])
-        extra_particles = neighbor_particles + surplus_particles
+        for n_cell in cell_neighbors[active_cell]:
+            neighbor_particles.extend([particle for particle in particle_cells[n_cell] if particle != i])
+        if profile:
+            clock = lap('neighbors', clock)
+        # identifying surplus particles outside the neighbor cells (in a fixed order, so that resumed runs are
+        # reproduced)
+        far_surplus_particles = sorted(surplus_particles.difference(neighbor_particles).difference([i]))
+        extra_particles = neighbor_particles + far_surplus_particles
+        if profile:
+            clock = lap('surplus', clock)
+            count('neighbor_particles', len(neighbor_particles))
+            count('surplus_particles', len(far_surplus_particles))
         # treating neighbor and surplus particles
-        extra_u_hats = [-math.log(random.random()) for i in range(len(extra_particles))]
-        extra_targets = [[y, L - x] for [x, y] in extra_particles] if sigma == [0.0, 1.0] else extra_particles
+        extra_u_hats = [-math.log(random.random()) for m in range(len(extra_particles))]
+        extra_targets = conf[extra_particles]
+        if sigma == [0.0, 1.0]:
+            extra_targets = np.column_stack([extra_targets[:, 1], L - extra_targets[:, 0]])
         active = part if sigma == [1.0, 0.0] else [part[1], L - part[0]]
-        displacements = [displacement_advanced(active, c, u_hat, L) for c, u_hat in zip(extra_targets, extra_u_hats)]
+        displacements = displacement_advanced_array(active, extra_targets, extra_u_hats, L, table=table).tolist()
         u_evals += len(extra_targets)
+        if profile:
+            clock = lap('displacements', clock)
         # treating target particles
         FakeRejection = False
-        if len(extra_particles) < len(conf) - 1:  # making sure that target particles actually exist
+        if len(extra_particles) < N - 1:  # making sure that target particles actually exist
             x = active[0]
-            act_cell = int(active[0] / cell_size) + n * int(active[1] / cell_size)
+            act_cell = int(active[0] / cell_size) % n + n * (int(active[1] / cell_size) % n)
             act_coord = [act_cell % n, int(act_cell / n)]
             delta_s_max = per_dist([(act_coord[0] + 1) * cell_size], [x], L)
             delta_s_max = cell_size if delta_s_max == 0.0 else delta_s_max
@@ -146,49 +183,51 @@ for chain in range(n_chains):
                 FakeRejection = True
             else:
                 displacements.append(delta_s)
+            if profile:
+                clock = lap('cell_veto', clock)
         # finding the next displacement
         delta_s = min(displacements)
         # if the total length is reached, the chain ends
         if current_length + delta_s > chain_length:
             distance += (chain_length - current_length)
             new_part = [(part[j] + sigma[j] * (chain_length - current_length)) % L for j in range(2)]
-            new_cell = int(new_part[0] / cell_size) + n * int(new_part[1] / cell_size)
-            particle_cells[active_cell].remove(part)
-            particle_cells[new_cell].append(new_part)
+            new_cell = int(new_part[0] / cell_size) % n + n * (int(new_part[1] / cell_size) % n)
+            move_particle(i, active_cell, new_cell, particle_cells, surplus_particles)
             part[:] = new_part
-            # updating the list of surplus particles
-            if new_cell != active_cell:
-                if len(particle_cells[active_cell]) == 1:
-                    surplus_cells.remove(active_cell)
-                if len(particle_cells[new_cell]) == 2:
-                    surplus_cells.append(new_cell)
+            if profile:
+                lap('move', clock)
+                count('chain_ends')
             break
         # if the total length has not been reached yet, the chain continues
         distance += delta_s
         current_length += delta_s
         new_part = [(part[j] + sigma[j] * delta_s) % L for j in range(2)]
-        new_cell = int(new_part[0] / cell_size) + n * int(new_part[1] / cell_size)
-        particle_cells[active_cell].remove(part)
-        particle_cells[new_cell].append(new_part)
+        new_cell = int(new_part[0] / cell_size) % n + n * (int(new_part[1] / cell_size) % n)
+        move_particle(i, active_cell, new_cell, particle_cells, surplus_particles)
         part[:] = new_part
-        # updating the list of surplus particles
-        if new_cell != active_cell:
-            if len(particle_cells[active_cell]) == 1:
-                surplus_cells.remove(active_cell)
-            if len(particle_cells[new_cell]) == 2:
-                surplus_cells.append(new_cell)
+        if profile:
+            clock = lap('move', clock)
         # selecting the new active particle
         k = displacements.index(delta_s)
         if k < len(extra_particles):
-            j = conf.index(extra_particles[k])
-            part = conf[j]
-        elif k == len(extra_particles) and not FakeRejection:
+            i = extra_particles[k]
+            if profile:
+                count('extra_lifts')
+        elif k == len(extra_particles) and FakeRejection:
+            if profile:
+                count('cell_crossings')
+        elif k == len(extra_particles):
             t_index = random.choice(range(n_q))
             if random.random() > prob_table[t_index]:
                 t_index = alias_table[t_index]
             t_cell = (active_cell % n + t_index % n) % n + n * ((int(active_cell / n) + int(t_index / n)) % n)
+            if profile:
+                clock = lap('alias', clock)
+                count('cell_vetoes')
+                count('empty_target_cells', not particle_cells[t_cell])
             if particle_cells[t_cell]:
-                target_particle = particle_cells[t_cell][0]
+                t = particle_cells[t_cell][0]
+                target_particle = conf[t]
                 r = per_dist(part, target_particle, L)
                 # computing the x or y separation (depending on sigma) between the active and the target particle
                 if sigma == [1.0, 0.0]:
@@ -200,22 +239,45 @@ for chain in range(n_chains):
                 else:
                     d = p_2 - p_1 - L if p_2 > p_1 else p_2 - p_1 + L
                 # checking whether the cell-veto rejection was fake or not, using the real rejection rate
-                if random.random() < (du_lj(r) * (d / r)) / diff_rates[t_index]:
-                    j = conf.index(target_particle)
-                    part = conf[j]
-    pair_part = random.sample(conf, 2)
-    pair_correlations.append(per_dist(pair_part[0], pair_part[1], L))
+                du = du_lj(r) if table is None else table_du(table, r)
+                if random.random() < (du * (d / r)) / diff_rates[t_index]:
+                    i = t
+                    if profile:
+                        count('real_vetoes')
+                if profile:
+                    lap('veto_check', clock)
+    pair_part = random.sample(range(N), 2)
+    pair_counts[histogram_bin(per_dist(conf[pair_part[0]], conf[pair_part[1]], L), L)] += 1
+    if (chain + 1) % snapshot_interval == 0:
+        snapshot_pair_counts += snapshot_counts(conf, L, r_snapshot)
+    if (chain + 1) % checkpoint_interval == 0:
+        [cell_particles, cell_counts] = flat_cells(particle_cells)
+        save_checkpoint(checkpoint_file, {'conf': conf, 'chain': chain + 1, 'u_evals': u_evals, 'distance': distance,
+                                          'cell_particles': cell_particles, 'cell_counts': cell_counts,
+                                          'pair_counts': pair_counts, 'snapshot_pair_counts': snapshot_pair_counts})
 
+print("Distance: " + str(distance))
 print("Evaluations/distance: " + str(u_evals / distance))
+if profile:
+    count('evaluations', u_evals - start_evals)
+    save_profile(args.profile, time.perf_counter() - start_time)
 
-with open(filename, "w") as file:
-    file.write(str(conf))
+# a replica does not modify the stored configuration, and its results are merged by replicas.py
+if args.replica is None:
+    save_conf(conf, N, density)
+else:
+    save_replica(replica_filename('ECCellVeto', N, density, args.replica),
+                 {'conf': conf, 'u_evals': u_evals, 'distance': distance, 'pair_counts': pair_counts,
+                  'pair_edges': histogram_edges(L), 'snapshot_pair_counts': snapshot_pair_counts,
+                  'snapshot_edges': snapshot_edges(L, r_snapshot)})
+remove_checkpoint(checkpoint_file)
 
 # to produce a file containing scaling data for this algorithm, uncomment the following two lines and run the program
 # several times with different values of N
-# with open('ScalingData/ECCellVetoScaling.data', "a") as file:
+# with open('ScalingData/ECCellVetoScaling_rho' + str(density) + '.data', "a") as file:
 #     file.write(str([N, u_evals / distance]) + '\n')
 
-# to produce a file containing pair-correlation data for this algorithm, uncomment the following two lines
-# with open('PairCorrelationData/ECCellVeto_N' + str(N) + '_rho' + str(density) + '_Correlation.data', "w") as file:
-#     file.write(str(pair_correlations))
+# to produce files containing pair-correlation data for this algorithm, uncomment the following lines
+# save_histogram(histogram_filename('ECCellVeto', N, density), pair_counts, histogram_edges(L))
+# save_histogram(histogram_filename('ECCellVetoFull', N, density), snapshot_pair_counts,
+#                snapshot_edges(L, r_snapshot))
@@ -14,177 +14,217 @@
 #
 import random
 import math
+import time
 import os.path
-from functions import u_lj, per_dist
+import numpy as np
+from arguments import sampler_arguments
+from functions import per_dist, delta_u_lj, move_particle, sigma
+from vectorized import patch_veto_set
+from cell_tables import reversible_tables
+from histograms import histogram_edges, histogram_bin, histogram_filename, save_histogram, n_bins
+from histograms import snapshot_edges, snapshot_counts, bins_below
+from checkpoint import load_conf, save_conf, load_checkpoint, save_checkpoint, remove_checkpoint
+from checkpoint import checkpoint_filename, replica_filename, save_replica, checkpoint_value
+from checkpoint import flat_cells, nested_cells
+from instrumentation import lap, count, save_profile, reset_profile
+from tuning import tuned_parameters
+from burn_in import window_size, new_tuner, record_moves, adapted_value, frozen_value
 
-N = 100
-density = 0.05
+# N, density, n_samples, the random seed, the file of the profile of the event loop, the number of cells per side and
+# the burn-in can be given on the command line (see arguments.py). The evaluations of the burn-in depend on the tables
+# computed for burn_in_delta, so that delta can only be adapted toward a target acceptance rate.
+args = sampler_arguments('reversible cell-veto algorithm', N=100, density=0.05, n_steps=10 ** 2, profile=True,
+                         cells=True, burn_in_criteria=['acceptance'])
+profile = args.profile is not None  # if True, the phases of the event loop are timed (see instrumentation.py)
+N = args.N
+density = args.density
+random.seed(args.seed)
+rng = np.random.default_rng(args.seed)
 L = math.sqrt(N / density)
 delta = 1.0
 
-# generating the cell rates
-n = 20
+# number of cells per side: given on the command line, chosen by autotune.py (see tuning.py), or 20
+parameters = tuned_parameters('MCCellVeto', N, density, {'n': 20})
+n = args.n if args.n is not None else parameters['n']
+
+# generating the cell rates and the Walker tables, unless they are stored in CellTables/ for the same parameters (the
+# tables of each value of delta are stored in a separate file). During the burn-in, delta is adapted up to burn_in_delta
+# (see burn_in.py), and the tables are computed for this value. At the end of the burn-in, delta is frozen and the
+# tables are computed for its final value, which is also used when a run is resumed after the burn-in.
 n_cells = n ** 2
 cell_size = L / n
-neighbor_indices = [(i % n) + n * (j % n) for i in [-1, 0, 1] for j in [-1, 0, 1]]
+analytic_bounds = True  # if False, the rates are estimated from n_trials random positions, with a safety factor 5
 n_trials = 10 ** 3
-cell_rates = []
-for k in range(n):
-    print("Row number " + str(k))
-    for j in range(n):
-        if j + n * k in neighbor_indices:
-            cell_rates.append(0.0)
-        else:
-            x_active = [[random.uniform(0, cell_size), random.uniform(0, cell_size)] for n in range(n_trials)]
-            new_x = [[(x[0] + random.uniform(-delta, delta)) % L, (x[1] + random.uniform(-delta, delta)) % L]
-                     for x in x_active]
-            x_target = [[random.uniform(j * cell_size, (j + 1) * cell_size),
-                        random.uniform(k * cell_size, (k + 1) * cell_size)] for m in range(n_trials)]
-            delta_u = max([u_lj(per_dist(new_x[i], x_target[i], L)) - u_lj(per_dist(x_active[i], x_target[i], L))
-                           for i in range(n_trials)])
-            if 1.0 - math.exp(-5.0 * delta_u) == 1.0:
-                cell_rates.append(0.0)
-                neighbor_indices.append(j + n * k)
-            else:
-                cell_rates.append(1.0 - math.exp(-5.0 * delta_u))
-
-# generating Walker tables
-intensities = [-math.log(1.0 - q) for q in cell_rates]
-P = sum(intensities)
-p_probs = [p / P for p in intensities]
-n_p = len(p_probs)
-prob_table = [n_p * p for p in p_probs]
-alias_table = [k for k in range(n_p)]
-over = []
-under = []
-for s in range(n_p):
-    if prob_table[s] > 1.0:
-        over.append(s)
-    elif prob_table[s] < 1.0:
-        under.append(s)
-count = 0
-while over and under:
-    print(count)
-    count += 1
-    i = random.choice(over)
-    j = random.choice(under)
-    alias_table[j] = i
-    under.remove(j)
-    prob_table[i] += prob_table[j] - 1.0
-    if prob_table[i] <= 1.0:
-        over.remove(i)
-    if prob_table[i] < 1.0:
-        under.append(i)
+n_processes = args.n_processes  # number of processes estimating the rates from random positions
+checkpoint_file = checkpoint_filename('MCCellVeto', N, density, args.replica)
+delta = checkpoint_value(checkpoint_file, 'delta', delta)
+burn_in_delta = max(delta, cell_size)
+if args.burn_in > 0 and not os.path.isfile(checkpoint_file):
+    [cell_rates, cell_neighbors, prob_table, alias_table, P] = reversible_tables(
+        'MCCellVeto', N, density, n, burn_in_delta, analytic_bounds, n_trials, n_processes)
+else:
+    [cell_rates, cell_neighbors, prob_table, alias_table, P] = reversible_tables(
+        'MCCellVeto', N, density, n, delta, analytic_bounds, n_trials, n_processes)
 
 # initial configuration
-filename = 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.data'
-if os.path.isfile(filename):
-    with open(filename, 'r') as file:
-        conf = [list(c) for c in eval(file.readline())]
-        particle_cells = {cell: [] for cell in range(n_cells)}
-        surplus_cells = []
-        for c in conf:
-            cell = int(c[0] / cell_size) + n * int(c[1] / cell_size)
-            particle_cells[cell].append(c)
-            if len(particle_cells[cell]) > 1 and cell not in surplus_cells:
-                surplus_cells.append(cell)
-else:
-    conf = []
-    particle_cells = {cell: [] for cell in range(n_cells)}
-    r = int(n_cells / N)
+conf = load_conf(N, density)
+if conf is None:
+    conf = np.zeros((N, 2))
+    # the particles are spread over the cells with a stride r (several particles per cell if n_cells < N)
+    r = max(n_cells // N, 1)
     for j in range(N):
-        [n_x, n_y] = [(r * j) % n, int((r * j) / n)]
-        x = random.uniform(n_x * cell_size, (n_x + 1) * cell_size)
-        y = random.uniform(n_y * cell_size, (n_y + 1) * cell_size)
-        conf.append([x, y])
-        particle_cells[r * j].append([x, y])
-    surplus_cells = []
+        [n_x, n_y] = [(r * j) % n, (r * j) % n_cells // n]
+        conf[j] = [random.uniform(n_x * cell_size, (n_x + 1) * cell_size),
+                   random.uniform(n_y * cell_size, (n_y + 1) * cell_size)]
 
-# sampling
-n_samples = 10 ** 2
-u_evals = 0
-distance = 0.0
-pair_correlations = []
-for sample in range(n_samples):
+# sampling (an interrupted run is resumed from its last checkpoint, written every checkpoint_interval samples). The
+# samples with negative indices form the burn-in: at its end, the counters and histograms are reset.
+n_samples = args.n_samples
+checkpoint_interval = 10 ** 4
+# every snapshot_interval samples, the distances between all the pairs closer than r_snapshot are added to the
+# snapshot histogram
+snapshot_interval = N
+r_snapshot = 5.0 * sigma
+if os.path.isfile(checkpoint_file):
+    state = load_checkpoint(checkpoint_file, rng)
+    [conf, first_sample, u_evals, distance] = [state['conf'], state['sample'], state['u_evals'], state['distance']]
+    particle_cells = nested_cells(state['cell_particles'], state['cell_counts'])
+    if len(particle_cells) != n_cells:
+        raise ValueError(checkpoint_file + ' was written with a different number of cells per side')
+    [pair_counts, snapshot_pair_counts] = [state['pair_counts'], state['snapshot_pair_counts']]
+else:
+    # particles are identified by their index in conf, and each cell keeps the list of the particles it contains
+    particle_cells = [[] for cell in range(n_cells)]
+    for j in range(N):
+        particle_cells[int(conf[j][0] / cell_size) % n + n * (int(conf[j][1] / cell_size) % n)].append(j)
+    [first_sample, u_evals, distance] = [-args.burn_in, 0, 0.0]
+    pair_counts = np.zeros(n_bins, dtype=np.int64)
+    snapshot_pair_counts = np.zeros(bins_below(r_snapshot, L), dtype=np.int64)
+surplus_particles = {particle for particles in particle_cells for particle in particles[1:]}
+tuner = new_tuner(delta, 10 ** (-3) * sigma, burn_in_delta)
+[start_time, start_evals] = [time.perf_counter(), u_evals]
+for sample in range(first_sample, n_samples):
     print(sample)
-    part = random.choice(conf)
+    if profile:
+        clock = time.perf_counter()
+        count('events')
+    i = random.randint(0, N - 1)
+    part = conf[i]
     [del_x, del_y] = [random.uniform(-delta, delta), random.uniform(-delta, delta)]
     new_part = [(part[0] + del_x) % L, (part[1] + del_y) % L]
-    active_cell = int(part[0] / cell_size) + n * int(part[1] / cell_size)
-    new_cell = int(new_part[0] / cell_size) + n * int(new_part[1] / cell_size)
-    # identifying neighbor cells and neighbor particles
-    neighbor_cells = [(active_cell % n + k % n) % n + n * ((int(active_cell / n) + int(k / n)) % n)
-                      for k in neighbor_indices]
+    accepted = False
+    active_cell = int(part[0] / cell_size) % n + n * (int(part[1] / cell_size) % n)
+    new_cell = int(new_part[0] / cell_size) % n + n * (int(new_part[1] / cell_size) % n)
+    # identifying neighbor particles
     neighbor_particles = []
-    for n_cell in neighbor_cells:
-        possible_neighbors = [particle for particle in particle_cells[n_cell] if particle != part]
-        if possible_neighbors:
-            neighbor_particles.extend(possible_neighbors[0:])
-    # identifying surplus particles
-    surplus_particles = []
-    for s_cell in surplus_cells:
-        if s_cell not in neighbor_cells:
-            surplus_particles.extend(particle_cells[s_cell][1:])
+    for n_cell in cell_neighbors[active_cell]:
+        neighbor_particles.extend([particle for particle in particle_cells[n_cell] if particle != i])
+    if profile:
+        clock = lap('neighbors', clock)
+    # identifying surplus particles outside the neighbor cells (in a fixed order, so that resumed runs are reproduced)
+    far_surplus_particles = sorted(surplus_particles.difference(neighbor_particles).difference([i]))
+    if profile:
+        clock = lap('surplus', clock)
+        count('neighbor_particles', len(neighbor_particles))
+        count('surplus_particles', len(far_surplus_particles))
     # treating surplus and neighbor particles
-    for s in surplus_particles + neighbor_particles:
+    for s in far_surplus_particles + neighbor_particles:
         u_evals += 2
-        delta_u = u_lj(per_dist(new_part, s, L)) - u_lj(per_dist(part, s, L))
+        delta_u = delta_u_lj(part, new_part, conf[s], L)
         metr_fil = math.exp(-delta_u) if delta_u > 0.0 else 1.0
         if random.random() > metr_fil:
+            if profile:
+                lap('direct_factors', clock)
+                count('direct_rejections')
             break
     else:
-        # identifying the set of target cells
-        powerset = set()
-        t = 0.0
-        while True:
-            t -= math.log(random.uniform(0.0, 1.0)) / P
-            if t > 1.0:
-                break
-            i = random.choice(range(n_p))
-            if random.random() < prob_table[i]:
-                powerset.add(i)
-            else:
-                powerset.add(alias_table[i])
+        if profile:
+            clock = lap('direct_factors', clock)
+        # identifying the set of target cells: the Poisson number of cells is drawn once, and the cells are sampled
+        # all at once with the Walker tables
+        powerset = patch_veto_set(prob_table, alias_table, P, rng)
         target_cells = {(active_cell % n + j % n) % n + n * ((int(active_cell / n) + int(j / n)) % n): cell_rates[j]
                         for j in powerset}
+        if profile:
+            clock = lap('poisson_veto', clock)
+            count('veto_cells', len(target_cells))
         # identifying target particles
         target_particles = []
         for t_cell in target_cells.keys():
             if particle_cells[t_cell]:
                 target_particles.append(particle_cells[t_cell][0])
+        if profile:
+            count('target_particles', len(target_particles))
         # deciding whether the former rejections were real or not
         for t in target_particles:
             u_evals += 2
-            t_cell = int(t[0] / cell_size) + n * int(t[1] / cell_size)
-            delta_u = u_lj(per_dist(new_part, t, L)) - u_lj(per_dist(part, t, L))
+            t_cell = int(conf[t][0] / cell_size) % n + n * (int(conf[t][1] / cell_size) % n)
+            delta_u = delta_u_lj(part, new_part, conf[t], L)
             fil = math.exp(-delta_u) if delta_u > 0.0 else 1.0
             if random.random() < (1.0 - fil) / target_cells[t_cell]:
+                if profile:
+                    lap('veto_check', clock)
+                    count('real_vetoes')
                 break
         else:
+            if profile:
+                clock = lap('veto_check', clock)
+                count('accepted_moves')
+                count('cell_crossings', new_cell != active_cell)
             # if there are no real rejections, update the active particle's position and associate it to its cell
+            accepted = True
             distance += math.sqrt(del_x ** 2 + del_y ** 2)
-            particle_cells[active_cell].remove(part)
-            particle_cells[new_cell].append(new_part)
+            move_particle(i, active_cell, new_cell, particle_cells, surplus_particles)
             part[:] = new_part
-            # updating the list of surplus particles
-            if new_cell != active_cell:
-                if len(particle_cells[active_cell]) == 1:
-                    surplus_cells.remove(active_cell)
-                if len(particle_cells[new_cell]) == 2:
-                    surplus_cells.append(new_cell)
-    pair_part = random.sample(conf, 2)
-    pair_correlations.append(per_dist(pair_part[0], pair_part[1], L))
+            if profile:
+                lap('move', clock)
+    pair_part = random.sample(range(N), 2)
+    pair_counts[histogram_bin(per_dist(conf[pair_part[0]], conf[pair_part[1]], L), L)] += 1
+    if (sample + 1) % snapshot_interval == 0:
+        snapshot_pair_counts += snapshot_counts(conf, L, r_snapshot)
+    if sample < 0:
+        record_moves(tuner, 1, accepted, 0.0, 0)
+        if (sample + 1) % window_size == 0:
+            delta = adapted_value(tuner, args.criterion, args.target_acceptance)
+        if sample == -1:
+            delta = frozen_value(tuner)
+            [cell_rates, cell_neighbors, prob_table, alias_table, P] = reversible_tables(
+                'MCCellVeto', N, density, n, delta, analytic_bounds, n_trials, n_processes)
+            [u_evals, distance] = [0, 0.0]
+            [pair_counts[:], snapshot_pair_counts[:]] = [0, 0]
+            print("Burn-in: delta = " + str(delta))
+            if profile:
+                reset_profile()
+                [start_time, start_evals] = [time.perf_counter(), u_evals]
+    elif (sample + 1) % checkpoint_interval == 0:
+        [cell_particles, cell_counts] = flat_cells(particle_cells)
+        save_checkpoint(checkpoint_file, {'conf': conf, 'sample': sample + 1, 'u_evals': u_evals, 'distance': distance,
+                                          'delta': delta, 'cell_particles': cell_particles, 'cell_counts': cell_counts,
+                                          'pair_counts': pair_counts, 'snapshot_pair_counts': snapshot_pair_counts},
+                        rng)
 
+print("Distance: " + str(distance))
 print("Evaluations/distance: " + str(u_evals / distance))
+if profile:
+    count('evaluations', u_evals - start_evals)
+    save_profile(args.profile, time.perf_counter() - start_time)
 
-with open(filename, "w") as file:
-    file.write(str(conf))
+# a replica does not modify the stored configuration, and its results are merged by replicas.py
+if args.replica is None:
+    save_conf(conf, N, density)
+else:
+    save_replica(replica_filename('MCCellVeto', N, density, args.replica),
+                 {'conf': conf, 'u_evals': u_evals, 'distance': distance, 'pair_counts': pair_counts,
+                  'pair_edges': histogram_edges(L), 'snapshot_pair_counts': snapshot_pair_counts,
+                  'snapshot_edges': snapshot_edges(L, r_snapshot)})
+remove_checkpoint(checkpoint_file)
 
 # to produce a file containing scaling data for this algorithm, uncomment the following two lines and run the program
 # several times with different values of N
 # with open('ScalingData/MCCellVetoScaling_rho' + str(density) + '.data', "a") as file:
 #     file.write(str([N, u_evals / distance]) + '\n')
 
-# to produce a file containing pair-correlation data for this algorithm, uncomment the following two lines
-# with open('PairCorrelationData/MCCellVeto_N' + str(N) + '_rho' + str(density) + '_Correlation.data', "w") as file:
-#     file.write(str(pair_correlations))
+# to produce files containing pair-correlation data for this algorithm, uncomment the following lines
+# save_histogram(histogram_filename('MCCellVeto', N, density), pair_counts, histogram_edges(L))
+# save_histogram(histogram_filename('MCCellVetoFull', N, density), snapshot_pair_counts,
+#                snapshot_edges(L, r_snapshot))
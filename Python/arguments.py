@@ -0,0 +1,70 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the command-line arguments shared by the Markov-chain algorithms: the number of particles, the
+# density, the number of samples (or chains), the random seed, the index of the replica (see replicas.py) and, for the
+# cell-veto algorithms, the file in which the profile of the run is written and the number of cells per side (and chain
+# length), for the Metropolis algorithms and EC_cell-veto.py, the tolerance of the tabulated potential, and, for the
+# Metropolis algorithms, the burn-in phase adapting the moves. Their default values are set in each program, so that
+# running a program without arguments reproduces the former behavior.
+#
+import os
+import argparse
+
+# number of short-range steps of multi-step_metropolis.py
+n_short_default = 4
+
+
+# name of the output files of multi-step_metropolis.py with n_short short-range steps
+def multi_step_name(n_short):
+    return 'MultiStep' + str(n_short)
+
+
+# names of the output files of each program (multi-step_metropolis.py with n_short = n_short_default)
+program_names = {'metropolis.py': 'Metropolis', 'factorized_metropolis.py': 'FactorizedMetropolis',
+                 'multi-step_metropolis.py': multi_step_name(n_short_default), 'MC_cell-veto.py': 'MCCellVeto',
+                 'EC_cell-veto.py': 'ECCellVeto'}
+
+
+# command-line arguments of an algorithm, with the number of steps called n_samples or n_chains depending on unit.
+# If profile is True, the option --profile (file in which the profile of the run is written) is also available, and if
+# tabulated is True, the option --tabulated (tolerance of the tabulated potential, see potential_table in functions.py).
+# The options --n (number of cells per side, and --n_processes, number of processes estimating the cell rates) and
+# --chain_length are available if cells and chain_length are True; if --n and --chain_length are not given, the values
+# chosen by autotune.py (or those of the program) are used. If burn_in_criteria is a list
+# of criteria, the options --burn_in (number of samples of the burn-in), --criterion and --target_acceptance are
+# available (see burn_in.py).
+def sampler_arguments(description, N, density, n_steps, unit='samples', profile=False, tabulated=False, cells=False,
+                      chain_length=False, burn_in_criteria=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--N', type=int, default=N, help='number of particles (default: %(default)s)')
+    parser.add_argument('--density', type=float, default=density, help='density (default: %(default)s)')
+    parser.add_argument('--n_' + unit, type=int, default=n_steps, help='number of ' + unit + ' (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random number generators')
+    parser.add_argument('--replica', type=int, default=None,
+                        help='index of the replica: the run does not modify the stored configuration, and writes its '
+                             'results to Replicas/')
+    if profile:
+        parser.add_argument('--profile', default=None, help='JSON file for the timers and counters of the event loop')
+    if tabulated:
+        parser.add_argument('--tabulated', type=float, default=None, metavar='TOLERANCE',
+                            help='replace u_lj by a tabulated potential with the given tolerance')
+    if cells:
+        parser.add_argument('--n', type=int, default=None, help='number of cells per side')
+        parser.add_argument('--n_processes', type=int, default=os.cpu_count(),
+                            help='number of processes estimating the cell rates (default: %(default)s)')
+    if chain_length:
+        parser.add_argument('--chain_length', type=float, default=None, help='length of the event chains')
+    if burn_in_criteria is not None:
+        parser.add_argument('--burn_in', type=int, default=0,
+                            help='number of samples of the burn-in adapting the moves (default: %(default)s)')
+        parser.add_argument('--criterion', choices=burn_in_criteria, default=burn_in_criteria[0],
+                            help='criterion of the burn-in (default: %(default)s)')
+        parser.add_argument('--target_acceptance', type=float, default=0.5,
+                            help='target acceptance rate of the burn-in (default: %(default)s)')
+    return parser.parse_args()
@@ -0,0 +1,97 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program chooses the number of cells per side n (and, for EC_cell-veto.py, the chain length) of a cell-veto
+# algorithm for given N and density. Short pilot runs (of pilot_samples samples, or of chains of total length
+# pilot_distance) are performed for each candidate value, all with the same seed and starting from the configuration
+# stored in InitialConfs/ (if any), in a temporary folder. For each of them, the
+# number of evaluations per unit distance and the wall time per unit distance (without the startup, i.e., the
+# generation of the tables) are measured, and the best value according to criterion is chosen. The candidates for n
+# are scanned first, with the default chain length, and the candidate chain lengths then with the chosen n. The choice
+# is stored in Tunings/ (see tuning.py), and is used by all following runs of the algorithm. The tables generated by
+# the pilot runs are kept in CellTables/.
+#
+import os
+import glob
+import math
+from arguments import program_names
+from checkpoint import conf_filename
+from cell_tables import table_filename, diff_rate_bound, delta_u_bound
+from tuning import save_tuning
+from pilot_runs import run_pilot
+
+algorithm = 'EC_cell-veto.py'  # 'MC_cell-veto.py' or 'EC_cell-veto.py'
+N = 100
+density = 0.05
+seed = 1
+criterion = 'time_per_distance'  # or 'evals_per_distance'
+cell_sides = [0.5, 0.67, 1.0, 1.5, 2.25, 3.0]  # candidate sides of the cells, in units of sigma = 1.0
+chain_lengths = [10.0, 20.0, 40.0, 80.0, 160.0]
+default_chain_length = 40.0
+# number of samples of each pilot run, and total length of the chains of each pilot run (for EC_cell-veto.py)
+pilot_samples = 2000
+pilot_distance = 2000.0
+
+name = program_names[algorithm]
+L = math.sqrt(N / density)
+
+
+# True if, for n cells per side, some cells are not neighbors of each cell (with the analytic bounds and the default
+# delta = 1.0 of MC_cell-veto.py). The bounds decrease with the distance, so that it suffices to check the farthest cell
+# [n // 2, n // 2], which must lie outside of the 3 x 3 block. Otherwise, all the cell rates vanish, and the Walker
+# tables cannot be generated.
+def has_veto_cells(n):
+    if n // 2 < 2:
+        return False
+    if algorithm == 'EC_cell-veto.py':
+        return diff_rate_bound(n // 2, n // 2, L / n, L) <= 0.5
+    return 1.0 - math.exp(-delta_u_bound(n // 2, n // 2, L / n, L, 1.0)) != 1.0
+
+
+n_candidates = sorted({n for n in [round(L / cell_side) for cell_side in cell_sides] if has_veto_cells(n)})
+if not n_candidates:
+    raise ValueError('all the cells are neighbors for the candidate sides of the cells: choose smaller ones')
+
+
+# names of the tables for n cells per side stored in directory (for MC_cell-veto.py, the tables of all the values of
+# delta), relative to directory
+def table_files(n, directory='.'):
+    pattern = table_filename(name, N, density, n, '*' if algorithm == 'MC_cell-veto.py' else None)
+    return [os.path.relpath(filename, directory) for filename in glob.glob(os.path.join(directory, pattern))]
+
+
+# running a pilot with n cells per side (and chain_length) in a new temporary folder (see pilot_runs.py), starting from
+# the stored configuration and tables, and measuring its performance. The tables generated by the pilot are kept.
+def run_tuning_pilot(n, chain_length=None):
+    arguments = ['--N', N, '--density', density, '--seed', seed, '--n', n]
+    if chain_length is None:
+        arguments += ['--n_samples', pilot_samples]
+    else:
+        arguments += ['--n_chains', max(int(pilot_distance / chain_length), 1), '--chain_length', chain_length]
+    pilot = run_pilot(algorithm, arguments, [conf_filename(N, density)] + table_files(n),
+                      lambda directory: table_files(n, directory))
+    return {'n': n, 'chain_length': chain_length, 'startup_time': pilot['startup_time'],
+            'evals_per_distance': pilot['evals_per_distance'],
+            'time_per_distance': pilot['sampling_time'] / pilot['distance']}
+
+
+pilots = []
+for n in n_candidates:
+    pilots.append(run_tuning_pilot(n, default_chain_length if algorithm == 'EC_cell-veto.py' else None))
+    print(pilots[-1])
+parameters = {'n': min(pilots, key=lambda pilot: pilot[criterion])['n']}
+if algorithm == 'EC_cell-veto.py':
+    chain_pilots = [pilot for pilot in pilots if pilot['n'] == parameters['n']]
+    for chain_length in chain_lengths:
+        if chain_length != default_chain_length:
+            chain_pilots.append(run_tuning_pilot(parameters['n'], chain_length))
+            print(chain_pilots[-1])
+    pilots += chain_pilots[1:]
+    parameters['chain_length'] = min(chain_pilots, key=lambda pilot: pilot[criterion])['chain_length']
+print(name + ', N = ' + str(N) + ', density = ' + str(density) + ': ' + str(parameters))
+save_tuning(name, N, density, parameters, pilots)
@@ -0,0 +1,120 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program measures the performance of the code. Each Markov-chain algorithm is run with a fixed seed for the values
+# of N in N_ladder, in a temporary folder (see pilot_runs.py, so that the stored configurations, tables and checkpoints
+# are neither used nor modified), and the following quantities are reported: the startup time (until the first sample), the number of
+# samples (or chains) per second, the number of evaluations per unit distance and the peak memory. The generation of
+# the cell-veto tables and the functions displacement_advanced and displacement_advanced_array are also timed.
+# The results are compared with the baseline stored in Benchmarks/ (written with the option --save), and the
+# quantities that are worse than the baseline by more than the tolerance are reported as regressions. The baseline
+# records whether the compiled functions of compiled.py were used: they give results that differ by rounding errors,
+# so that the number of evaluations per unit distance is only required to be reproduced exactly if the baseline was
+# computed with the same functions.
+#
+import os
+import sys
+import json
+import math
+import timeit
+import argparse
+import numpy as np
+from functions import displacement_advanced, numba_available
+from vectorized import displacement_advanced_array
+from checkpoint import atomic_save
+from pilot_runs import run_pilot
+from cell_tables import table_wedge, diff_rate_bound, delta_u_bound, sampled_diff_rate, sampled_delta_u
+
+parser = argparse.ArgumentParser(description='benchmarks of the Markov-chain algorithms')
+parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+parser.add_argument('--baseline', default='Benchmarks/baseline.json',
+                    help='file of the baseline (default: %(default)s)')
+parser.add_argument('--tolerance', type=float, default=0.2, help='relative tolerance (default: %(default)s)')
+args = parser.parse_args()
+
+seed = 1
+N_ladder = [25, 50, 100, 200]
+# number of samples (or chains) of each program
+programs = {'metropolis.py': ['--n_samples', 2000], 'factorized_metropolis.py': ['--n_samples', 2000],
+            'multi-step_metropolis.py': ['--n_samples', 500], 'MC_cell-veto.py': ['--n_samples', 2000],
+            'EC_cell-veto.py': ['--n_chains', 20]}
+batch_sizes = [8, 32, 128, 512]
+
+
+# running a program with a fixed seed (see pilot_runs.py), and measuring its performance
+def run_program(program, N, option, n_steps):
+    pilot = run_pilot(program, ['--N', N, '--seed', seed, option, n_steps])
+    return {'startup_time': pilot['startup_time'], 'steps_per_second': n_steps / pilot['sampling_time'],
+            'evals_per_distance': pilot['evals_per_distance'], 'peak_memory_mb': pilot['peak_memory_mb']}
+
+
+# time per target particle of displacement_advanced and displacement_advanced_array, for batches of n_targets targets
+def time_displacements(n_targets, size=math.sqrt(100 / 0.05)):
+    rng = np.random.default_rng(seed)
+    active = [size / 2, size / 2]
+    targets = rng.uniform(0.0, size, (n_targets, 2))
+    u_hats = (-np.log(rng.random(n_targets))).tolist()
+    scalar_time = min(timeit.repeat(lambda: [displacement_advanced(active, target, u_hat, size)
+                                             for target, u_hat in zip(targets.tolist(), u_hats)], number=10, repeat=5))
+    array_time = min(timeit.repeat(lambda: displacement_advanced_array(active, targets, u_hats, size), number=10,
+                                   repeat=5))
+    return [scalar_time / (10 * n_targets), array_time / (10 * n_targets)]
+
+
+# time of the generation of the cell rates on one process (best of five)
+def time_table(rate_function, n, args, sampled=False):
+    return min(timeit.repeat(lambda: table_wedge(rate_function, n, args, 1, sampled), number=1, repeat=5))
+
+
+results = {'environment': {'numba': numba_available}}
+for program, [option, n_steps] in programs.items():
+    for N in N_ladder:
+        results[program + ' N=' + str(N)] = run_program(program, N, option, n_steps)
+        print(program + ' N=' + str(N) + ': ' + str(results[program + ' N=' + str(N)]))
+for n_targets in batch_sizes:
+    [scalar_time, array_time] = time_displacements(n_targets)
+    results['displacement_advanced n_targets=' + str(n_targets)] = {'time_per_target': scalar_time}
+    results['displacement_advanced_array n_targets=' + str(n_targets)] = {'time_per_target': array_time}
+# default parameters of the two cell-veto programs, with analytic bounds and with n_trials = 100 random positions
+L = math.sqrt(100 / 0.05)
+results['MC_cell-veto.py table n=20'] = {'table_time': time_table(delta_u_bound, 20, (L / 20, L, 1.0))}
+results['EC_cell-veto.py table n=67'] = {'table_time': time_table(diff_rate_bound, 67, (L / 67, L))}
+results['MC_cell-veto.py sampled table n=20'] = {'table_time': time_table(sampled_delta_u, 20, (L / 20, L, 1.0, 100),
+                                                                          True)}
+results['EC_cell-veto.py sampled table n=67'] = {'table_time': time_table(sampled_diff_rate, 67, (L / 67, L, 100),
+                                                                          True)}
+for key in list(results)[1 + len(programs) * len(N_ladder):]:
+    print(key + ': ' + str(results[key]))
+
+if args.save:
+    atomic_save(args.baseline, lambda file: json.dump(results, file, indent=2), 'w')
+elif os.path.isfile(args.baseline):
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)
+    # quantities that should be large, and quantities that should not change for fixed seeds
+    larger_is_better = ['steps_per_second']
+    exact = ['evals_per_distance'] if baseline.get('environment') == results['environment'] else []
+    if not exact:
+        print('The baseline was computed with other functions (Numba): the evaluations are compared with the tolerance')
+    regressions = []
+    for key in set(baseline).intersection(results).difference(['environment']):
+        for quantity, value in results[key].items():
+            reference = baseline[key].get(quantity)
+            if reference is None:
+                continue
+            if quantity in exact:
+                worse = not math.isclose(value, reference, rel_tol=1e-9)
+            elif quantity in larger_is_better:
+                worse = value < (1.0 - args.tolerance) * reference
+            else:
+                worse = value > (1.0 + args.tolerance) * reference
+            if worse:
+                regressions.append(key + ', ' + quantity + ': ' + str(value) + ' (baseline: ' + str(reference) + ')')
+    print('Regressions with respect to ' + args.baseline + ':')
+    print('\n'.join(sorted(regressions)) if regressions else 'none')
+    sys.exit(1 if regressions else 0)
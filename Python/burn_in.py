@@ -0,0 +1,67 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions adapting the parameters of the Metropolis algorithms (the range delta of the
+# moves and, for the multi-time-step algorithm, the number of short-range steps n_short) during a burn-in phase (option
+# --burn_in, see arguments.py). The moves of the burn-in are grouped in windows of window_size samples, and at the end
+# of each window the parameter is updated, either toward a target acceptance rate (criterion 'acceptance'), or toward
+# the maximum of the mean-squared displacement per evaluation (criterion 'displacement'), by climbing with a factor that
+# is reduced each time the direction is reversed. At the end of the burn-in, the parameters are frozen, so that the
+# samples of the run are produced by a Markov chain with fixed moves, which satisfies detailed balance.
+#
+import math
+
+window_size = 1000
+
+
+# tuner of a parameter (a dictionary) with initial value and bounds, for integer values if integer is True
+def new_tuner(value, lower, upper, integer=False):
+    return {'value': value, 'lower': lower, 'upper': upper, 'integer': integer, 'factor': 2.0, 'direction': 1,
+            'score': None, 'moves': 0, 'accepted': 0, 'squared_distance': 0.0, 'evals': 0}
+
+
+# adding n_moves moves to the current window of a tuner, of which n_accepted are accepted, with a total squared
+# displacement squared_distance and n_evals evaluations
+def record_moves(tuner, n_moves, n_accepted, squared_distance, n_evals):
+    tuner['moves'] += n_moves
+    tuner['accepted'] += n_accepted
+    tuner['squared_distance'] += squared_distance
+    tuner['evals'] += n_evals
+
+
+# discarding the moves of the current window of a tuner
+def reset_window(tuner):
+    [tuner['moves'], tuner['accepted'], tuner['squared_distance'], tuner['evals']] = [0, 0, 0.0, 0]
+
+
+# value of the parameter for the following window, given the moves of the current one (which are then discarded)
+def adapted_value(tuner, criterion, target_acceptance):
+    value = tuner['value']
+    if criterion == 'acceptance':
+        # the acceptance rate decreases with delta
+        value *= math.exp(2.0 * (tuner['accepted'] / max(tuner['moves'], 1) - target_acceptance))
+    else:
+        score = tuner['squared_distance'] / max(tuner['evals'], 1)
+        if tuner['score'] is not None and score < tuner['score']:
+            tuner['direction'] = -tuner['direction']
+            tuner['factor'] = math.sqrt(tuner['factor'])
+        tuner['score'] = score
+        value *= tuner['factor'] ** tuner['direction']
+    if tuner['integer']:
+        value = round(value)
+        if value == tuner['value'] and criterion != 'acceptance':
+            value += tuner['direction']
+    tuner['value'] = min(max(value, tuner['lower']), tuner['upper'])
+    reset_window(tuner)
+    return tuner['value']
+
+
+# value of the parameter at the end of the burn-in (rounded to three significant digits, so that the tables of the
+# reversible cell-veto algorithm stored for this value are reused)
+def frozen_value(tuner):
+    return tuner['value'] if tuner['integer'] else float('%.3g' % tuner['value'])
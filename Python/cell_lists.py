@@ -0,0 +1,56 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions handling cell lists: the periodic box is divided into n x n square cells, whose
+# side is at least a given cutoff, so that all the particles closer than the cutoff to a point are contained in the
+# 3 x 3 block of cells around it. Particles are identified by their index in the configuration.
+#
+import numpy as np
+
+
+# number of cells per side, for cells whose side is at least r_cut
+def cells_per_side(size, r_cut):
+    return max(int(size / r_cut), 1)
+
+
+# index of the cell containing the point pos
+def cell_index(pos, n, size):
+    return int(pos[0] * n / size) % n + n * (int(pos[1] * n / size) % n)
+
+
+# lists of the particles contained in each cell
+def cell_lists(conf, n, size):
+    particle_cells = [[] for cell in range(n ** 2)]
+    for j in range(len(conf)):
+        particle_cells[cell_index(conf[j], n, size)].append(j)
+    return particle_cells
+
+
+# cells of the 3 x 3 block around each cell (without repetitions, if n < 3)
+def cell_blocks(n):
+    return [sorted({(cell % n + i) % n + n * ((cell // n + j) % n) for i in [-1, 0, 1] for j in [-1, 0, 1]})
+            for cell in range(n ** 2)]
+
+
+# coordinates [column, row] of the cells containing the points of the array pos
+def cell_coordinates(pos, n, size):
+    return (np.asarray(pos) * n / size).astype(int) % n
+
+
+# shells of the cells with coordinates coords around the cell [x, y], in order of increasing distance: 0 for the
+# 3 x 3 block, and then 1, 2, 3, ... for the cells at a distance (along the farthest axis, in cells) of 2, 3 to 4,
+# 5 to 8, ..., so that the number of shells grows only logarithmically with n
+def cell_shells(coords, x, y, n):
+    offsets = (coords - [x, y]) % n
+    d = np.max(np.minimum(offsets, n - offsets), axis=-1)
+    return np.frexp(np.maximum(d - 1, 0))[1]
+
+
+# particles contained in the cells of block
+def block_particles(block, particle_cells):
+    return [j for cell in block for j in particle_cells[cell]]
@@ -0,0 +1,197 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions that store the tables of the cell-veto algorithms (cell rates, neighbor indices
+# and Walker tables) in the folder CellTables/, and reload them in the following runs. The tables are saved together
+# with the parameters used to compute them, and they are recomputed whenever one of these parameters changes.
+# It also contains the analytic upper bounds of the cell rates, computed from the minimum and maximum separation
+# between two cells, their estimates from random positions, and the symmetries of the lattice of cells that leave these
+# rates unchanged. The estimates from random positions of the different rows of cells are computed in parallel on
+# several processes, with seeds derived from the parameters of the tables.
+#
+import os
+import math
+import random
+import multiprocessing
+import numpy as np
+from functions import u_lj, du_lj, per_dist, walker_tables, sigma, epsilon
+from checkpoint import atomic_save
+
+
+# name of the file containing the tables of a cell-veto algorithm (for the reversible algorithm, which depends on the
+# range delta of the moves, the tables of each value of delta are stored in a separate file)
+def table_filename(name, N, density, n, delta=None):
+    suffix = '' if delta is None else '_delta' + str(delta)
+    return 'CellTables/' + name + '_N' + str(N) + '_rho' + str(density) + '_n' + str(n) + suffix + '.npz'
+
+
+# stored tables [rates, neighbor_indices, prob_table, alias_table], or None if they were computed with other parameters
+def load_tables(filename, parameters):
+    if not os.path.isfile(filename):
+        return None
+    with np.load(filename) as data:
+        stored_parameters = dict(zip(data['parameter_names'].tolist(), data['parameter_values'].tolist()))
+        if stored_parameters != {key: float(value) for key, value in parameters.items()}:
+            return None
+        return [data['rates'].tolist(), data['neighbor_indices'].tolist(), data['prob_table'].tolist(),
+                data['alias_table'].tolist()]
+
+
+# storing the tables together with the parameters used to compute them
+def save_tables(filename, parameters, rates, neighbor_indices, prob_table, alias_table):
+    atomic_save(filename, lambda file: np.savez(
+        file, parameter_names=np.array(list(parameters.keys())),
+        parameter_values=np.array(list(parameters.values()), dtype=float),
+        rates=np.array(rates, dtype=float), neighbor_indices=np.array(neighbor_indices, dtype=np.int32),
+        prob_table=np.array(prob_table, dtype=float), alias_table=np.array(alias_table, dtype=np.int32)))
+
+
+# cells obtained from cell j + n * k through the reflections x <-> -x, y <-> -y and x <-> y, all having the same rate
+def symmetric_cells(j, k, n):
+    cells = set()
+    for [a, b] in [[j, k], [k, j]]:
+        for [a_ref, b_ref] in [[a, b], [-a % n, b], [a, -b % n], [-a % n, -b % n]]:
+            cells.add(a_ref + n * b_ref)
+    return sorted(cells)
+
+
+# minimum and maximum periodic distance along one axis, for separations between d_min and d_max
+def axis_dist_range(d_min, d_max, size):
+    ends = [abs(d - size * round(d / size)) for d in [d_min, d_max]]
+    # the periodic distance vanishes at multiples of size and is maximal at odd multiples of size / 2
+    dist_min = 0.0 if math.floor(d_max / size) >= math.ceil(d_min / size) else min(ends)
+    dist_max = size / 2 if math.floor(d_max / size - 0.5) >= math.ceil(d_min / size - 0.5) else max(ends)
+    return [dist_min, dist_max]
+
+
+# minimum and maximum distance between a point of cell 0 and a point of cell j + n * k, where each point may be
+# displaced by up to margin along each axis
+def cell_dist_range(j, k, cell_size, size, margin=0.0):
+    [x_min, x_max] = axis_dist_range((j - 1) * cell_size - margin, (j + 1) * cell_size + margin, size)
+    [y_min, y_max] = axis_dist_range((k - 1) * cell_size - margin, (k + 1) * cell_size + margin, size)
+    return [math.sqrt(x_min ** 2 + y_min ** 2), math.sqrt(x_max ** 2 + y_max ** 2)]
+
+
+# maximum of |du_lj| between r_min and r_max (for r > r_well, |du_lj| is maximal at r_infl)
+def du_lj_max(r_min, r_max):
+    if r_min == 0.0:
+        return math.inf
+    r_infl = (26.0 / 7.0) ** (1 / 6) * sigma
+    du_max = max(abs(du_lj(r_min)), abs(du_lj(r_max)))
+    return max(du_max, abs(du_lj(r_infl))) if r_min < r_infl < r_max else du_max
+
+
+# upper bound of the differential rate of cell j + n * k in the event-chain cell-veto algorithm
+def diff_rate_bound(j, k, cell_size, size):
+    return du_lj_max(*cell_dist_range(j, k, cell_size, size))
+
+
+# upper bound of the variation of u_lj in the reversible cell-veto algorithm, for an active particle in cell 0,
+# displaced by up to delta along each axis, and a target particle in cell j + n * k
+def delta_u_bound(j, k, cell_size, size, delta):
+    [r_min, r_max] = cell_dist_range(j, k, cell_size, size)
+    [r_min_new, r_max_new] = cell_dist_range(j, k, cell_size, size, delta)
+    if r_min_new == 0.0:
+        return math.inf
+    # u_lj has no local maximum, and its minimum is at r_well
+    r_well = 2 ** (1 / 6) * sigma
+    u_min = -epsilon if r_min < r_well < r_max else min(u_lj(r_min), u_lj(r_max))
+    u_max = max(u_lj(r_min_new), u_lj(r_max_new))
+    # the distance varies by at most sqrt(2) * delta
+    return min(u_max - u_min, du_lj_max(r_min_new, r_max_new) * math.sqrt(2.0) * delta)
+
+
+# estimate of the differential rate of cell j + n * k from n_trials random positions drawn with the generator rng (an
+# instance of random.Random), with a safety factor 5
+def sampled_diff_rate(j, k, cell_size, size, n_trials, rng):
+    x_active = [[rng.uniform(0, cell_size), rng.uniform(0, cell_size)] for m in range(n_trials)]
+    x_target = [[rng.uniform(j * cell_size, (j + 1) * cell_size),
+                 rng.uniform(k * cell_size, (k + 1) * cell_size)] for m in range(n_trials)]
+    distances = [per_dist(x, y, size) for x, y in zip(x_active, x_target)]
+    return 5.0 * max([abs(du_lj(r)) for r in distances])
+
+
+# estimate of the variation of u_lj in the reversible cell-veto algorithm from n_trials random positions drawn with the
+# generator rng, with a safety factor 5
+def sampled_delta_u(j, k, cell_size, size, delta, n_trials, rng):
+    x_active = [[rng.uniform(0, cell_size), rng.uniform(0, cell_size)] for m in range(n_trials)]
+    new_x = [[(x[0] + rng.uniform(-delta, delta)) % size, (x[1] + rng.uniform(-delta, delta)) % size]
+             for x in x_active]
+    x_target = [[rng.uniform(j * cell_size, (j + 1) * cell_size),
+                 rng.uniform(k * cell_size, (k + 1) * cell_size)] for m in range(n_trials)]
+    return 5.0 * max([u_lj(per_dist(new_x[i], x_target[i], size)) - u_lj(per_dist(x_active[i], x_target[i], size))
+                      for i in range(n_trials)])
+
+
+# values of rate_function(j, k, *args) for the cells j <= k of row k. If seed is not None, the rates are estimated from
+# random positions, drawn with a private generator of the row (the random module of the calling program is unchanged).
+def table_row(rate_function, k, args, seed):
+    if seed is None:
+        return [rate_function(j, k, *args) for j in range(k + 1)]
+    rng = random.Random(seed)
+    return [rate_function(j, k, *args, rng) for j in range(k + 1)]
+
+
+# values of rate_function(j, k, *args) for the cells j <= k <= n / 2 (rows[k][j]). The analytic bounds are computed on
+# the calling process, while the estimates from random positions (if sampled is True) are computed on n_processes
+# processes, with row seeds derived from n and args only, so that the same tables are obtained on any number of
+# processes and independently of the random seed of the calling program.
+def table_wedge(rate_function, n, args, n_processes=1, sampled=False):
+    if not sampled:
+        return [table_row(rate_function, k, args, None) for k in range(n // 2 + 1)]
+    entropy = [n] + np.array(args, dtype=float).view(np.uint64).tolist()
+    seeds = np.random.SeedSequence(entropy).generate_state(n // 2 + 1, dtype=np.uint64).tolist()
+    jobs = [(rate_function, k, args, seeds[k]) for k in range(n // 2 + 1)]
+    # the worker processes are forked, so that the calling script is not executed again
+    if n_processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [table_row(*job) for job in jobs]
+    with multiprocessing.get_context('fork').Pool(n_processes) as pool:
+        return pool.starmap(table_row, jobs)
+
+
+# tables of the reversible cell-veto algorithm (MC_cell-veto.py) for n cells per side and moves of range delta: the
+# cell rates, the absolute indices of the neighbor cells of each cell, the Walker tables (as arrays) and the total rate
+# P. They are reloaded from the file of the given name if they were stored with the same parameters, and computed and
+# stored otherwise.
+def reversible_tables(name, N, density, n, delta, analytic_bounds, n_trials, n_processes):
+    L = math.sqrt(N / density)
+    n_cells = n ** 2
+    cell_size = L / n
+    table_file = table_filename(name, N, density, n, delta)
+    table_parameters = {'N': N, 'density': density, 'n': n, 'delta': delta, 'analytic_bounds': analytic_bounds,
+                        'n_trials': n_trials, 'sigma': sigma, 'epsilon': epsilon}
+    tables = load_tables(table_file, table_parameters)
+    if tables is None:
+        neighbor_indices = [(i % n) + n * (j % n) for i in [-1, 0, 1] for j in [-1, 0, 1]]
+        cell_rates = [0.0] * n_cells
+        # the rates are only computed for j <= k <= n / 2, the other cells follow from the symmetries of the lattice
+        if analytic_bounds:
+            rows = table_wedge(delta_u_bound, n, (cell_size, L, delta))
+        else:
+            rows = table_wedge(sampled_delta_u, n, (cell_size, L, delta, n_trials), n_processes, sampled=True)
+        for k in range(n // 2 + 1):
+            for j in range(k + 1):
+                if j + n * k in neighbor_indices:
+                    continue
+                delta_u = rows[k][j]
+                if 1.0 - math.exp(-delta_u) == 1.0:
+                    neighbor_indices.extend(symmetric_cells(j, k, n))
+                else:
+                    for cell in symmetric_cells(j, k, n):
+                        cell_rates[cell] = 1.0 - math.exp(-delta_u)
+
+        # generating Walker tables
+        [prob_table, alias_table] = walker_tables([-math.log(1.0 - q) for q in cell_rates])
+        save_tables(table_file, table_parameters, cell_rates, neighbor_indices, prob_table, alias_table)
+    else:
+        [cell_rates, neighbor_indices, prob_table, alias_table] = tables
+    P = sum([-math.log(1.0 - q) for q in cell_rates])
+    # absolute indices of the neighbor cells of each cell
+    cell_neighbors = [[(cell % n + k % n) % n + n * ((int(cell / n) + int(k / n)) % n) for k in neighbor_indices]
+                      for cell in range(n_cells)]
+    return [cell_rates, cell_neighbors, np.array(prob_table), np.array(alias_table), P]
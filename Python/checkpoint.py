@@ -0,0 +1,125 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions that store configurations and checkpoints in binary (NumPy) files.
+# Configurations are stored in the folder InitialConfs/ as .npy files. Checkpoints are stored in the folder
+# Checkpoints/ as .npz files, containing the configuration, the state of the random number generators and all the
+# quantities (counters, cell lists, ...) needed to resume an interrupted run exactly where it stopped. The replicas of
+# an algorithm (see replicas.py) have their own checkpoints, and store their results in the folder Replicas/. All files
+# are written with atomic_save, which is also used by the other programs.
+#
+import os
+import json
+import random
+import numpy as np
+
+
+# writing a file with the function write (of the open file). The file is written under a temporary name, proper to the
+# process, and then renamed, so that programs running at the same time never read an incomplete file and never write
+# to the same temporary file.
+def atomic_save(filename, write, mode='wb'):
+    temporary_file = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary_file, mode) as file:
+        write(file)
+    os.replace(temporary_file, filename)
+
+
+# name of the checkpoint of an algorithm, or of one of its replicas if replica is not None
+def checkpoint_filename(name, N, density, replica=None):
+    suffix = '' if replica is None else '_replica' + str(replica)
+    return 'Checkpoints/' + name + '_N' + str(N) + '_rho' + str(density) + suffix + '.npz'
+
+
+# name of the file containing the results of a replica of an algorithm
+def replica_filename(name, N, density, replica):
+    return 'Replicas/' + name + '_N' + str(N) + '_rho' + str(density) + '_replica' + str(replica) + '.npz'
+
+
+# name of the file containing the configuration for given N and density
+def conf_filename(N, density):
+    return 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.npy'
+
+
+# stored configuration for given N and density, or None if there is none (files in the former text format, written
+# with str(conf), are still read)
+def load_conf(N, density):
+    filename = conf_filename(N, density)
+    if os.path.isfile(filename):
+        return np.load(filename)
+    if os.path.isfile(filename[:-4] + '.data'):
+        with open(filename[:-4] + '.data', 'r') as file:
+            return np.array(eval(file.readline()), dtype=float)
+    return None
+
+
+# storing the configuration for given N and density
+def save_conf(conf, N, density):
+    atomic_save(conf_filename(N, density), lambda file: np.save(file, np.asarray(conf, dtype=float)))
+
+
+# storing the quantities in state (a dictionary of numbers and arrays), together with the state of the random module
+# and of the NumPy generator rng, if any
+def save_checkpoint(filename, state, rng=None):
+    [version, internal_state, gauss_next] = random.getstate()
+    random_state = {'random_version': version, 'random_state': np.array(internal_state, dtype=np.uint64),
+                    'random_gauss_next': np.nan if gauss_next is None else gauss_next}
+    if rng is not None:
+        random_state['numpy_rng_state'] = json.dumps(rng.bit_generator.state)
+    atomic_save(filename, lambda file: np.savez(file, **random_state, **state))
+
+
+# quantities stored in a checkpoint, as a dictionary of numbers and arrays. The states of the random module and of
+# the NumPy generator rng, if any, are restored.
+def load_checkpoint(filename, rng=None):
+    with np.load(filename) as data:
+        state = {key: data[key].item() if data[key].ndim == 0 else data[key] for key in data.files}
+    gauss_next = state.pop('random_gauss_next')
+    random.setstate((state.pop('random_version'), tuple(int(x) for x in state.pop('random_state')),
+                     None if np.isnan(gauss_next) else gauss_next))
+    numpy_rng_state = state.pop('numpy_rng_state', None)
+    if rng is not None and numpy_rng_state is not None:
+        rng.bit_generator.state = json.loads(numpy_rng_state)
+    return state
+
+
+# quantity key stored in a checkpoint, read without restoring the states of the random number generators (default if
+# there is no checkpoint, or if the checkpoint was written without this quantity)
+def checkpoint_value(filename, key, default):
+    if not os.path.isfile(filename):
+        return default
+    with np.load(filename) as data:
+        return data[key].item() if key in data.files else default
+
+
+# storing the results of a replica (a dictionary of numbers and arrays)
+def save_replica(filename, results):
+    atomic_save(filename, lambda file: np.savez(file, **results))
+
+
+# results of a replica, as a dictionary of numbers and arrays
+def load_replica(filename):
+    with np.load(filename) as data:
+        return {key: data[key].item() if data[key].ndim == 0 else data[key] for key in data.files}
+
+
+# removing the checkpoint of a run that has been completed
+def remove_checkpoint(filename):
+    if os.path.isfile(filename):
+        os.remove(filename)
+
+
+# cell lists as two flat arrays: the particles, cell after cell, and the number of particles in each cell
+def flat_cells(particle_cells):
+    return [np.array([j for particles in particle_cells for j in particles], dtype=int),
+            np.array([len(particles) for particles in particle_cells], dtype=int)]
+
+
+# cell lists from the two flat arrays produced by flat_cells
+def nested_cells(cell_particles, cell_counts):
+    ends = np.cumsum(cell_counts).tolist()
+    return [cell_particles[end - count:end].tolist() for end, count in zip(ends, cell_counts.tolist())]
@@ -0,0 +1,224 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains versions of the functions per_dist, u_lj, r_disp, x_disp, displacement_advanced, delta_u_lj and
+# short_range_u of functions.py that act on scalars and arrays only (coordinates instead of lists of coordinates, the
+# parameters of the potential as arguments), so that they can be compiled with Numba. They perform the same
+# floating-point operations as the functions of functions.py. The exponents are written as floats, so that Numba
+# computes the powers with pow, as CPython does, instead of repeated multiplications; the squares x ** 2.0 are still
+# computed as x * x by the compiler, so that the compiled distances and displacements differ from those of functions.py
+# by rounding errors (a few units in the last place, in about 0.03% of the displacements). If Numba is installed (and
+# use_numba is True), functions.py replaces displacement_advanced, delta_u_lj and short_range_u with their compiled
+# versions, and otherwise nothing changes. The scalar functions per_dist, u_lj, du_lj, r_disp and x_disp are not
+# replaced: each call of a compiled function from Python costs about as much as the evaluation of one of them, so that
+# only the functions performing many operations per call are faster when compiled.
+#
+import math
+
+use_numba = True
+try:
+    from numba import njit
+    numba_available = use_numba
+except ImportError:
+    numba_available = False
+
+# decorator compiling the functions below if Numba is available (the compiled code is cached on disk)
+jit = njit(cache=True) if numba_available else (lambda function: function)
+
+
+# periodic distance between coordinates a and b along one axis
+@jit
+def axis_dist(a, b, size):
+    return min(abs(a - b), size - abs(a - b))
+
+
+# periodic distance between points (ax, ay) and (bx, by)
+@jit
+def per_dist_xy(ax, ay, bx, by, size):
+    return math.sqrt(axis_dist(ax, bx, size) ** 2.0 + axis_dist(ay, by, size) ** 2.0)
+
+
+# Lennard-Jones potential
+@jit
+def u_lj_r(r, sigma, epsilon):
+    return 4.0 * epsilon * ((sigma / r) ** 12.0 - (sigma / r) ** 6.0)
+
+
+# variation of u_lj between the active particle and the target particle (tx, ty), when the active particle is moved from
+# (ax, ay) to (nx, ny)
+@jit
+def delta_u_xy(ax, ay, nx, ny, tx, ty, size, sigma, epsilon):
+    return (u_lj_r(per_dist_xy(nx, ny, tx, ty, size), sigma, epsilon) -
+            u_lj_r(per_dist_xy(ax, ay, tx, ty, size), sigma, epsilon))
+
+
+# sum of u_lj between (x, y) and the particles of conf with indices in neighbors, other than i, that are closer than
+# r_c, and number of these particles
+@jit
+def short_range_u_xy(x, y, conf, neighbors, i, r_c, size, sigma, epsilon):
+    u = 0.0
+    n_evals = 0
+    for j in neighbors:
+        r = per_dist_xy(x, y, conf[j, 0], conf[j, 1], size)
+        if j != i and r < r_c:
+            u += u_lj_r(r, sigma, epsilon)
+            n_evals += 1
+    return u, n_evals
+
+
+# the two r-displacements [r1, r2] producing a variation delta_u in u_lj, starting from r0 (r1 = -1.0 if it does not
+# exist)
+@jit
+def r_disp_pair(r0, delta_u, sigma, epsilon):
+    root = math.sqrt(1.0 + (u_lj_r(r0, sigma, epsilon) + delta_u) / epsilon)
+    if 1.0 - root == 0.0:
+        return 1.0, math.inf
+    r2 = (0.5 * (1.0 + root)) ** (-1 / 6)
+    if 0.5 * (1.0 - root) < 0.0:
+        return -1.0, r2
+    return (0.5 * (1.0 - root)) ** (-1 / 6), r2
+
+
+# larger r-displacement, max(r_disp(r0, delta_u))
+@jit
+def outer_root(r0, delta_u, sigma, epsilon):
+    [r1, r2] = r_disp_pair(r0, delta_u, sigma, epsilon)
+    return max(r1, r2)
+
+
+# smaller r-displacement if it exists, and larger one otherwise
+@jit
+def inner_root(r0, delta_u, sigma, epsilon):
+    [r1, r2] = r_disp_pair(r0, delta_u, sigma, epsilon)
+    return min(r1, r2) if min(r1, r2) > 0.0 else max(r1, r2)
+
+
+# x-displacement relative to r_final, starting from (ix, iy), with the target particle at (tx, ty)
+@jit
+def x_disp_xy(ix, iy, tx, ty, r_final, size):
+    delta_x_0 = axis_dist(tx, ix, size)
+    delta_y = axis_dist(iy, ty, size)
+    delta_x_final = math.sqrt(r_final ** 2.0 - delta_y ** 2.0) if delta_y <= r_final else 0.0
+    return abs(delta_x_final - delta_x_0)
+
+
+# x-displacement of the active particle (ax, ay) producing a variation delta_u in u_lj with respect to the target
+# particle (tx, ty), as in displacement_advanced
+@jit
+def displacement_xy(ax, ay, tx, ty, delta_u, size, sigma, epsilon):
+    if delta_u == 0.0:
+        return 0.0
+    r_min = per_dist_xy(tx, ay, tx, ty, size)
+    r_max = per_dist_xy((tx + size / 2) % size, ay, tx, ty, size)
+    r0 = per_dist_xy(ax, ay, tx, ty, size)
+    r_well = 2 ** (1 / 6) * sigma
+    # variation of u_lj over a period
+    if r_min > r_well or r_max < r_well:
+        delta_u_period = abs(u_lj_r(r_min, sigma, epsilon) - u_lj_r(r_max, sigma, epsilon))
+    else:
+        delta_u_period = (abs(u_lj_r(r_min, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon)) +
+                          abs(u_lj_r(r_max, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon)))
+    n_periods = int(delta_u / delta_u_period)
+    du = delta_u_period * n_periods
+    # remaining variation of u_lj
+    u_left = delta_u - du
+    if u_left <= 0.0:
+        return size * n_periods
+    r_move = per_dist_xy((ax + 10 ** (-3)) % size, ay, tx, ty, size)
+    moving_away = r_move > r0  # direction of motion of the active particle
+    x_opposite = (tx + size / 2) % size
+    x_left1 = x_left2 = x_left3 = x_left4 = 0.0
+    if r_min >= r_well:
+        if moving_away:
+            r = outer_root(r0, u_left, sigma, epsilon)
+            if r0 <= r <= r_max:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r, size)
+            else:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r_max, size)
+                x_left2 = size / 2
+                u_left = u_left - (u_lj_r(r_max, sigma, epsilon) - u_lj_r(r0, sigma, epsilon))
+                r = outer_root(r_min, u_left, sigma, epsilon)
+                x_left3 = x_disp_xy(tx, ay, tx, ty, r, size)
+        if not moving_away:
+            x_left1 = x_disp_xy(ax, ay, tx, ty, r_min, size)
+            r = outer_root(r_min, u_left, sigma, epsilon)
+            x_left2 = x_disp_xy(tx, ay, tx, ty, r, size)
+    if r_max <= r_well:
+        # this case never occurs if the box is big enough
+        if moving_away:
+            x_left1 = x_disp_xy(ax, ay, tx, ty, r_max, size)
+            r = inner_root(r_max, u_left, sigma, epsilon)
+            x_left2 = x_disp_xy(x_opposite, ay, tx, ty, r, size)
+        if not moving_away:
+            r = inner_root(r0, u_left, sigma, epsilon)
+            if r_min <= r <= r0:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r, size)
+            else:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r_min, size)
+                x_left2 = size / 2
+                u_left = u_left - (u_lj_r(r_min, sigma, epsilon) - u_lj_r(r0, sigma, epsilon))
+                r = inner_root(r_max, u_left, sigma, epsilon)
+                x_left3 = x_disp_xy(x_opposite, ay, tx, ty, r, size)
+    if r_min < r_well < r_max:
+        delta_y = axis_dist(ay, ty, size)
+        x_well = (tx + math.sqrt(r_well ** 2.0 - delta_y ** 2.0)) % size
+        if r0 >= r_well:
+            if moving_away:
+                r = outer_root(r0, u_left, sigma, epsilon)
+                if r0 <= r <= r_max:
+                    x_left1 = x_disp_xy(ax, ay, tx, ty, r, size)
+                else:
+                    x_left1 = x_disp_xy(ax, ay, tx, ty, r_max, size)
+                    x_left2 = x_disp_xy(x_opposite, ay, tx, ty, r_well, size)
+                    u_left = u_left - (u_lj_r(r_max, sigma, epsilon) - u_lj_r(r0, sigma, epsilon))
+                    r = inner_root(r_well, u_left, sigma, epsilon)
+                    if r_min < r < r_well:
+                        x_left3 = x_disp_xy(x_well, ay, tx, ty, r, size)
+                    else:
+                        x_left3 = 2 * x_disp_xy(x_well, ay, tx, ty, r_min, size)
+                        u_left = u_left - (u_lj_r(r_min, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon))
+                        r = outer_root(r_well, u_left, sigma, epsilon)
+                        x_left4 = x_disp_xy(x_well, ay, tx, ty, r, size)
+            if not moving_away:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r_well, size)
+                r = inner_root(r_well, u_left, sigma, epsilon)
+                if r_min <= r <= r_well:
+                    x_left2 = x_disp_xy(x_well, ay, tx, ty, r, size)
+                else:
+                    x_left2 = 2 * x_disp_xy(x_well, ay, tx, ty, r_min, size)
+                    u_left = u_left - (u_lj_r(r_min, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon))
+                    r = outer_root(r_well, u_left, sigma, epsilon)
+                    x_left3 = x_disp_xy(x_well, ay, tx, ty, r, size)
+        if r0 < r_well:
+            if moving_away:
+                x_left1 = x_disp_xy(ax, ay, tx, ty, r_well, size)
+                r = outer_root(r_well, u_left, sigma, epsilon)
+                if r_well <= r <= r_max:
+                    x_left2 = x_disp_xy(x_well, ay, tx, ty, r, size)
+                else:
+                    x_left2 = 2 * x_disp_xy(x_well, ay, tx, ty, r_max, size)
+                    u_left = u_left - (u_lj_r(r_max, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon))
+                    r = inner_root(r_well, u_left, sigma, epsilon)
+                    x_left3 = x_disp_xy(x_well, ay, tx, ty, r, size)
+            if not moving_away:
+                r = inner_root(r0, u_left, sigma, epsilon)
+                if r_min <= r <= r0:
+                    x_left1 = x_disp_xy(ax, ay, tx, ty, r, size)
+                else:
+                    x_left1 = x_disp_xy(ax, ay, tx, ty, r_min, size)
+                    x_left2 = x_disp_xy(tx, ay, tx, ty, r_well, size)
+                    u_left = u_left - (u_lj_r(r_min, sigma, epsilon) - u_lj_r(r0, sigma, epsilon))
+                    r = outer_root(r_well, u_left, sigma, epsilon)
+                    if r_well <= r <= r_max:
+                        x_left3 = x_disp_xy(x_well, ay, tx, ty, r, size)
+                    else:
+                        x_left3 = 2 * x_disp_xy(x_well, ay, tx, ty, r_max, size)
+                        u_left = u_left - (u_lj_r(r_max, sigma, epsilon) - u_lj_r(r_well, sigma, epsilon))
+                        [r1, r2] = r_disp_pair(r_well, u_left, sigma, epsilon)
+                        x_left4 = x_disp_xy(x_well, ay, tx, ty, min(r1, r2), size)
+    return size * n_periods + (x_left1 + x_left2 + x_left3 + x_left4)
@@ -14,66 +14,132 @@
 import random
 import math
 import os.path
-from functions import per_dist, u_lj
+import numpy as np
+from arguments import sampler_arguments
+from functions import per_dist, u_lj, du_lj, potential_table, sigma
+from vectorized import subset_pair_delta_u, total_energy
+from cell_lists import cells_per_side, cell_coordinates, cell_shells
+from histograms import histogram_edges, histogram_bin, histogram_filename, save_histogram, n_bins
+from histograms import snapshot_edges, snapshot_counts, bins_below
+from checkpoint import load_conf, save_conf, load_checkpoint, save_checkpoint, remove_checkpoint
+from checkpoint import checkpoint_filename, replica_filename, save_replica
+from burn_in import window_size, new_tuner, record_moves, adapted_value, frozen_value
 
-N = 100
-density = 0.05
+# N, density, n_samples, the random seed, the tolerance of the tabulated potential and the burn-in can be given on the
+# command line (see arguments.py)
+args = sampler_arguments('factorized Metropolis algorithm', N=100, density=0.05, n_steps=10 ** 2,
+                         tabulated=True, burn_in_criteria=['acceptance', 'displacement'])
+N = args.N
+density = args.density
+random.seed(args.seed)
 L = math.sqrt(N / density)
 delta = 1.0
+# tabulated potential, from half the diameter of the particles to the largest distance in the box (u_lj if None)
+table = None
+if args.tabulated is not None:
+    table = potential_table(u_lj, du_lj, 0.5 * sigma, 2 ** (1 / 6) * sigma, L / math.sqrt(2.0), args.tabulated)
 
-# initial configuration
-filename = 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.data'
-if os.path.isfile(filename):
-    with open(filename, 'r') as file:
-        conf = [list(c) for c in eval(file.readline())]
-else:
-    conf = [[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)]
+# cells of side at least r_near, so that the particles closer than r_near to the active particle are in the 3 x 3
+# block of cells around it, which is the first of the shells of cells around it (see cell_shells in cell_lists.py)
+r_near = 3.0 * sigma
+n_near = cells_per_side(L, r_near)
 
-u_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N) if j != i])
+# initial configuration
+conf = load_conf(N, density)
+if conf is None:
+    conf = np.array([[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)])
+rng = np.random.default_rng(args.seed)
 
-# sampling
-n_samples = 10 ** 2
-u_evals = 0
-distance = 0.0
-acc = 0
-pair_correlations = []
-for sample in range(n_samples):
+# sampling (an interrupted run is resumed from its last checkpoint, written every checkpoint_interval samples). The
+# samples with negative indices form the burn-in, during which delta is adapted (see burn_in.py): at its end, delta is
+# frozen and the counters and histograms are reset.
+n_samples = args.n_samples
+checkpoint_interval = 10 ** 4
+checkpoint_file = checkpoint_filename('FactorizedMetropolis', N, density, args.replica)
+# every snapshot_interval samples, the distances between all the pairs closer than r_snapshot are added to the
+# snapshot histogram
+snapshot_interval = N
+r_snapshot = 5.0 * sigma
+if os.path.isfile(checkpoint_file):
+    state = load_checkpoint(checkpoint_file, rng)
+    [conf, first_sample, u_test, delta] = [state['conf'], state['sample'], state['u_test'], state.get('delta', delta)]
+    [u_evals, distance, acc] = [state['u_evals'], state['distance'], state['acc']]
+    [pair_counts, snapshot_pair_counts] = [state['pair_counts'], state['snapshot_pair_counts']]
+else:
+    u_test = total_energy(conf, L, table)
+    [first_sample, u_evals, distance, acc] = [-args.burn_in, 0, 0.0, 0]
+    pair_counts = np.zeros(n_bins, dtype=np.int64)
+    snapshot_pair_counts = np.zeros(bins_below(r_snapshot, L), dtype=np.int64)
+particle_coords = cell_coordinates(conf, n_near, L)
+tuner = new_tuner(delta, 10 ** (-3) * sigma, L / 2)
+for sample in range(first_sample, n_samples):
     print(sample)
-    part = random.choice(conf)
+    i = random.randint(0, N - 1)
+    part = conf[i]
     [del_x, del_y] = [random.uniform(-delta, delta), random.uniform(-delta, delta)]
     new_part = [(part[0] + del_x) % L, (part[1] + del_y) % L]
-    delta_u = 0.0
-    for c in conf:
-        if c == part:
-            continue
-        u_evals += 2
-        delta_u_pair = u_lj(per_dist(new_part, c, L)) - u_lj(per_dist(part, c, L))
-        metr_fil = math.exp(-delta_u_pair) if delta_u_pair > 0.0 else 1.0
-        delta_u += delta_u_pair
-        if random.uniform(0.0, 1.0) > metr_fil:
+    # pair factors are evaluated shell by shell, in order of increasing distance from the active particle: first those
+    # of the particles in the 3 x 3 block of cells around it, which cause most rejections, and then those of the
+    # particles in the following shells of cells, up to the first shell containing a rejection. The factors of a shell
+    # are computed at once, and all of them are counted as evaluations.
+    particle_shells = cell_shells(particle_coords, *particle_coords[i], n_near)
+    particle_shells[i] = -1
+    [delta_u, n_evals, accepted] = [0.0, 0, True]
+    for shell in range(particle_shells.max() + 1):
+        js = np.flatnonzero(particle_shells == shell)
+        delta_u_pairs = subset_pair_delta_u(conf, i, new_part, js, L, table)
+        n_evals += 2 * len(js)
+        if np.any(rng.random(len(js)) > np.exp(-np.maximum(delta_u_pairs, 0.0))):
+            accepted = False
             break
-    else:
+        delta_u += float(np.sum(delta_u_pairs))
+    u_evals += n_evals
+    if accepted:
         acc += 1
         distance += math.sqrt(del_x ** 2 + del_y ** 2)
         u_test += delta_u
+        particle_coords[i] = cell_coordinates(new_part, n_near, L)
         part[:] = new_part
-    pair_part = random.sample(conf, 2)
-    pair_correlations.append(per_dist(pair_part[0], pair_part[1], L))
+    pair_part = random.sample(range(N), 2)
+    pair_counts[histogram_bin(per_dist(conf[pair_part[0]], conf[pair_part[1]], L), L)] += 1
+    if (sample + 1) % snapshot_interval == 0:
+        snapshot_pair_counts += snapshot_counts(conf, L, r_snapshot)
+    if sample < 0:
+        record_moves(tuner, 1, accepted, (del_x ** 2 + del_y ** 2) * accepted, n_evals)
+        if (sample + 1) % window_size == 0:
+            delta = adapted_value(tuner, args.criterion, args.target_acceptance)
+        if sample == -1:
+            delta = frozen_value(tuner)
+            [u_evals, distance, acc] = [0, 0.0, 0]
+            [pair_counts[:], snapshot_pair_counts[:]] = [0, 0]
+            print("Burn-in: delta = " + str(delta))
+    elif (sample + 1) % checkpoint_interval == 0:
+        save_checkpoint(checkpoint_file, {'conf': conf, 'sample': sample + 1, 'u_test': u_test, 'u_evals': u_evals,
+                                          'distance': distance, 'acc': acc, 'delta': delta, 'pair_counts': pair_counts,
+                                          'snapshot_pair_counts': snapshot_pair_counts}, rng)
 
-u_final = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N) if j != i])
+u_final = total_energy(conf, L, table)
 
 print("Sanity check: |u_test - u_final| = " + str(abs(u_test - u_final)))
 print("Acceptance rate: " + str(acc / n_samples))
 print("Evaluations/distance: " + str(u_evals / distance))
 
-with open(filename, "w") as file:
-    file.write(str(conf))
+# a replica does not modify the stored configuration, and its results are merged by replicas.py
+if args.replica is None:
+    save_conf(conf, N, density)
+else:
+    save_replica(replica_filename('FactorizedMetropolis', N, density, args.replica),
+                 {'conf': conf, 'u_evals': u_evals, 'distance': distance, 'pair_counts': pair_counts,
+                  'pair_edges': histogram_edges(L), 'snapshot_pair_counts': snapshot_pair_counts,
+                  'snapshot_edges': snapshot_edges(L, r_snapshot)})
+remove_checkpoint(checkpoint_file)
 
 # to produce a file containing scaling data for this algorithm, uncomment the following two lines and run the program
 # several times with different values of N
 # with open('ScalingData/FactorizedMetropolisScaling_rho' + str(density) + '.data', "a") as file:
 #     file.write(str([N, u_evals / distance]) + '\n')
 
-# to produce a file containing pair-correlation data for this algorithm, uncomment the following two lines
-# with open('PairCorrelationData/FactorizedMetropolis_' + str(N) + '_rho' + str(density) + '_Correlation.data', "w") as file:
-#     file.write(str(pair_correlations))
+# to produce files containing pair-correlation data for this algorithm, uncomment the following lines
+# save_histogram(histogram_filename('FactorizedMetropolis', N, density), pair_counts, histogram_edges(L))
+# save_histogram(histogram_filename('FactorizedMetropolisFull', N, density), snapshot_pair_counts,
+#                snapshot_edges(L, r_snapshot))
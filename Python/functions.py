@@ -9,6 +9,9 @@
 # This program contains some auxiliary functions needed to run the Markov-chain algorithms.
 #
 import math
+import bisect
+import numpy as np
+from compiled import numba_available, displacement_xy, delta_u_xy, short_range_u_xy
 
 sigma = 1.0
 epsilon = 1.0 / 0.46
@@ -47,19 +50,165 @@ def x_disp(initial_pos, target_particle, r_final, size):
     return abs(delta_x_final - delta_x_0)
 
 
-# x-displacement of active_particle producing a variation delta_u in u_lj with respect to target_particle
-def displacement_advanced(active_particle, target_particle, delta_u, size):
+# variation of u_lj between the active particle and target_particle, when the active particle is moved from part to
+# new_part
+def delta_u_lj(part, new_part, target_particle, size):
+    return u_lj(per_dist(new_part, target_particle, size)) - u_lj(per_dist(part, target_particle, size))
+
+
+# sum of u_lj between pos and the particles of conf with indices in neighbors, other than i, that are closer than r_c,
+# and number of these particles
+def short_range_u(pos, conf, neighbors, i, r_c, size):
+    [u, n_evals] = [0.0, 0]
+    for j in neighbors:
+        r = per_dist(pos, conf[j], size)
+        if j != i and r < r_c:
+            u += u_lj(r)
+            n_evals += 1
+    return [u, n_evals]
+
+
+# tabulated pair potential u, with derivative du (both accepting floats and NumPy arrays), a single minimum at r_well
+# and u(r) -> 0 for r -> infinity. u is interpolated with cubic Hermite polynomials on uniform grids of
+# [r_lo, r_well] (inner branch) and [r_well, r_hi] (outer branch), whose number of intervals is doubled until the
+# interpolation errors of u and du, estimated at the quarter points of the intervals, are below tolerance (relative
+# errors where |u| or |du| is larger than 1, as in the repulsive core). Outside of [r_lo, r_hi], u and du are
+# evaluated directly. The node values ('keys', increasing along each branch) are kept for the inversion (table_root).
+def potential_table(u, du, r_lo, r_well, r_hi, tolerance, n_min=16):
+    table = {'u': u, 'du': du, 'r_lo': r_lo, 'r_well': r_well, 'r_hi': r_hi, 'tolerance': tolerance}
+    for [branch, a, b] in [['inner', r_lo, r_well], ['outer', r_well, r_hi]]:
+        n = n_min
+        while True:
+            h = (b - a) / n
+            nodes = [a + k * h for k in range(n)] + [b]
+            [values, slopes] = [[float(u(r)) for r in nodes], [float(du(r)) * h for r in nodes]]
+            coefficients = [(values[k], slopes[k], 3.0 * (values[k + 1] - values[k]) - 2.0 * slopes[k] - slopes[k + 1],
+                             2.0 * (values[k] - values[k + 1]) + slopes[k] + slopes[k + 1]) for k in range(n)]
+            segment = {'r_lo': a, 'h': h, 'n': n, 'values': values, 'coefficients': coefficients,
+                       'keys': [-v for v in values] if branch == 'inner' else values}
+            table[branch] = segment
+            tests = [a + (k + t) * h for k in range(n) for t in [0.25, 0.5, 0.75]]
+            error = max([max(abs(table_u(table, r) - u(r)) / max(1.0, abs(u(r))),
+                              abs(table_du(table, r) - du(r)) / max(1.0, abs(du(r)))) for r in tests])
+            if error <= tolerance:
+                break
+            n *= 2
+        [segment['array'], segment['key_array']] = [np.array(coefficients), np.array(segment['keys'])]
+    return table
+
+
+# interval of the tabulated potential containing r (None if r is outside of [r_lo, r_hi]), and position in it
+def table_interval(table, r):
+    if not table['r_lo'] <= r <= table['r_hi']:
+        return [None, 0, 0.0]
+    segment = table['inner'] if r < table['r_well'] else table['outer']
+    x = (r - segment['r_lo']) / segment['h']
+    k = min(int(x), segment['n'] - 1)
+    return [segment, k, x - k]
+
+
+# tabulated potential
+def table_u(table, r):
+    [segment, k, t] = table_interval(table, r)
+    if segment is None:
+        return table['u'](r)
+    [c0, c1, c2, c3] = segment['coefficients'][k]
+    return c0 + t * (c1 + t * (c2 + t * c3))
+
+
+# derivative of the tabulated potential
+def table_du(table, r):
+    [segment, k, t] = table_interval(table, r)
+    if segment is None:
+        return table['du'](r)
+    [c0, c1, c2, c3] = segment['coefficients'][k]
+    return (c1 + t * (2.0 * c2 + 3.0 * t * c3)) / segment['h']
+
+
+# r with u(r) = target between a and b, where u(r) - target changes sign (bisection down to the machine precision)
+def bisect_root(u, target, a, b):
+    sign_a = u(a) > target
+    while True:
+        m = 0.5 * (a + b)
+        if not a < m < b:
+            return m
+        if (u(m) > target) == sign_a:
+            a = m
+        else:
+            b = m
+
+
+# r on one branch ('inner' or 'outer') of the tabulated potential with table_u(r) = target, or -1.0 if there is
+# none. Inside the table, the cubic polynomial of the interval found by bisection in the node values is solved with
+# Newton's method, safeguarded by bisection, so that the result is the exact inverse of table_u (up to rounding
+# errors): the roots differ from those of u by at most tolerance / |du| (absolute error of table_u over the slope).
+# Outside of the table, the root of u is bracketed by halving r_lo, or by doubling r_hi, and found by bisection.
+def table_root(table, branch, target):
+    segment = table[branch]
+    sign = -1.0 if branch == 'inner' else 1.0
+    keys = segment['keys']
+    if sign * target < keys[0]:
+        if branch == 'outer':
+            raise ValueError('target energy below the minimum of the potential')
+        a = table['r_lo']
+        while table['u'](a) < target:
+            a *= 0.5
+        return bisect_root(table['u'], target, a, table['r_lo'])
+    if sign * target > keys[-1]:
+        if branch == 'inner':
+            raise ValueError('target energy below the minimum of the potential')
+        if target >= 0.0:
+            return -1.0
+        b = table['r_hi']
+        while table['u'](b) < target:
+            b *= 2.0
+        return bisect_root(table['u'], target, table['r_hi'], b)
+    k = min(bisect.bisect_right(keys, sign * target) - 1, segment['n'] - 1)
+    [c0, c1, c2, c3] = segment['coefficients'][k]
+    [t_lo, t_hi] = [0.0, 1.0]
+    t = (target - c0) / (segment['values'][k + 1] - c0) if segment['values'][k + 1] != c0 else 0.5
+    for iteration in range(100):
+        f = c0 + t * (c1 + t * (c2 + t * c3)) - target
+        if f == 0.0:
+            break
+        if sign * f > 0.0:
+            t_hi = t
+        else:
+            t_lo = t
+        df = c1 + t * (2.0 * c2 + 3.0 * t * c3)
+        t_new = t - f / df if df != 0.0 else t_lo - 1.0
+        if not t_lo < t_new < t_hi:
+            t_new = 0.5 * (t_lo + t_hi)
+        if t_new == t:
+            break
+        t = t_new
+    return segment['r_lo'] + (k + t) * segment['h']
+
+
+# r-displacements of the tabulated potential producing a variation delta_u, starting from r0, in the format of r_disp
+# ([outer, inner] root, the outer one being replaced by -1.0 if it does not exist)
+def table_r_disp(table, r0, delta_u):
+    target = table_u(table, r0) + delta_u
+    return [table_root(table, 'outer', target), table_root(table, 'inner', target)]
+
+
+# x-displacement of active_particle producing a variation delta_u in u_lj with respect to target_particle. If table
+# is given (see potential_table), the tabulated potential is used instead of u_lj.
+def displacement_advanced(active_particle, target_particle, delta_u, size, table=None):
+    if table is None:
+        [u, roots, r_well] = [u_lj, r_disp, 2 ** (1 / 6) * sigma]
+    else:
+        [u, roots, r_well] = [lambda r: table_u(table, r), lambda r0, du: table_r_disp(table, r0, du), table['r_well']]
     if delta_u == 0.0:
         return 0.0
     r_min = per_dist([target_particle[0], active_particle[1]], target_particle, size)
     r_max = per_dist([(target_particle[0] + size / 2) % size, active_particle[1]], target_particle, size)
     r0 = per_dist(active_particle, target_particle, size)
-    r_well = 2 ** (1 / 6) * sigma
     # variation of u_lj over a period
     if r_min > r_well or r_max < r_well:
-        delta_u_period = abs(u_lj(r_min) - u_lj(r_max))
+        delta_u_period = abs(u(r_min) - u(r_max))
     else:
-        delta_u_period = abs(u_lj(r_min) - u_lj(r_well)) + abs(u_lj(r_max) - u_lj(r_well))
+        delta_u_period = abs(u(r_min) - u(r_well)) + abs(u(r_max) - u(r_well))
     n_periods = int(delta_u / delta_u_period)
     du = delta_u_period * n_periods
     # remaining variation of u_lj
@@ -71,91 +220,148 @@ def displacement_advanced(active_particle, target_particle, delta_u, size):
     x_left1 = x_left2 = x_left3 = x_left4 = 0.0
     if r_min >= r_well:
         if moving_away:
-            r = max(r_disp(r0, u_left))
+            r = max(roots(r0, u_left))
             if r0 <= r <= r_max:
                 x_left1 = x_disp(active_particle, target_particle, r, size)
             else:
                 x_left1 = x_disp(active_particle, target_particle, r_max, size)
                 x_left2 = size / 2
-                u_left = u_left - (u_lj(r_max) - u_lj(r0))
-                r = max(r_disp(r_min, u_left))
+                u_left = u_left - (u(r_max) - u(r0))
+                r = max(roots(r_min, u_left))
                 x_left3 = x_disp([target_particle[0], active_particle[1]], target_particle, r, size)
         if not moving_away:
             x_left1 = x_disp(active_particle, target_particle, r_min, size)
-            r = max(r_disp(r_min, u_left))
+            r = max(roots(r_min, u_left))
             x_left2 = x_disp([target_particle[0], active_particle[1]], target_particle, r, size)
     if r_max <= r_well:
         # this case never occurs if the box is big enough
         if moving_away:
             x_left1 = x_disp(active_particle, target_particle, r_max, size)
-            r = min(r_disp(r_max, u_left)) if min(r_disp(r_max, u_left)) > 0.0 else max(r_disp(r_max, u_left))
+            r = min(roots(r_max, u_left)) if min(roots(r_max, u_left)) > 0.0 else max(roots(r_max, u_left))
             x_left2 = x_disp([(target_particle[0] + size / 2) % size, active_particle[1]], target_particle, r, size)
         if not moving_away:
-            r = min(r_disp(r0, u_left)) if min(r_disp(r0, u_left)) > 0.0 else max(r_disp(r0, u_left))
+            r = min(roots(r0, u_left)) if min(roots(r0, u_left)) > 0.0 else max(roots(r0, u_left))
             if r_min <= r <= r0:
                 x_left1 = x_disp(active_particle, target_particle, r, size)
             else:
                 x_left1 = x_disp(active_particle, target_particle, r_min, size)
                 x_left2 = size / 2
-                u_left = u_left - (u_lj(r_min) - u_lj(r0))
-                r = min(r_disp(r_max, u_left)) if min(r_disp(r_max, u_left)) > 0 else max(r_disp(r_max, u_left))
+                u_left = u_left - (u(r_min) - u(r0))
+                r = min(roots(r_max, u_left)) if min(roots(r_max, u_left)) > 0 else max(roots(r_max, u_left))
                 x_left3 = x_disp([(target_particle[0] + size / 2) % size, active_particle[1]], target_particle, r, size)
     if r_min < r_well < r_max:
         delta_y = per_dist([active_particle[1]], [target_particle[1]], size)
         x_well = [(target_particle[0] + math.sqrt(r_well ** 2 - delta_y ** 2)) % size, active_particle[1]]
         if r0 >= r_well:
             if moving_away:
-                r = max(r_disp(r0, u_left))
+                r = max(roots(r0, u_left))
                 if r0 <= r <= r_max:
                     x_left1 = x_disp(active_particle, target_particle, r, size)
                 else:
                     x_left1 = x_disp(active_particle, target_particle, r_max, size)
                     x_left2 = x_disp([(target_particle[0] + size / 2) % size, active_particle[1]],
                                      target_particle, r_well, size)
-                    u_left = u_left - (u_lj(r_max) - u_lj(r0))
-                    r = min(r_disp(r_well, u_left)) if min(r_disp(r_well, u_left)) > 0 else max(r_disp(r_well, u_left))
+                    u_left = u_left - (u(r_max) - u(r0))
+                    r = min(roots(r_well, u_left)) if min(roots(r_well, u_left)) > 0 else max(roots(r_well, u_left))
                     if r_min < r < r_well:
                         x_left3 = x_disp(x_well, target_particle, r, size)
                     else:
                         x_left3 = 2 * x_disp(x_well, target_particle, r_min, size)
-                        u_left = u_left - (u_lj(r_min) - u_lj(r_well))
-                        r = max(r_disp(r_well, u_left))
+                        u_left = u_left - (u(r_min) - u(r_well))
+                        r = max(roots(r_well, u_left))
                         x_left4 = x_disp(x_well, target_particle, r, size)
             if not moving_away:
                 x_left1 = x_disp(active_particle, target_particle, r_well, size)
-                r = min(r_disp(r_well, u_left)) if min(r_disp(r_well, u_left)) > 0 else max(r_disp(r_well, u_left))
+                r = min(roots(r_well, u_left)) if min(roots(r_well, u_left)) > 0 else max(roots(r_well, u_left))
                 if r_min <= r <= r_well:
                     x_left2 = x_disp(x_well, target_particle, r, size)
                 else:
                     x_left2 = 2 * x_disp(x_well, target_particle, r_min, size)
-                    u_left = u_left - (u_lj(r_min) - u_lj(r_well))
-                    r = max(r_disp(r_well, u_left))
+                    u_left = u_left - (u(r_min) - u(r_well))
+                    r = max(roots(r_well, u_left))
                     x_left3 = x_disp(x_well, target_particle, r, size)
         if r0 < r_well:
             if moving_away:
                 x_left1 = x_disp(active_particle, target_particle, r_well, size)
-                r = max(r_disp(r_well, u_left))
+                r = max(roots(r_well, u_left))
                 if r_well <= r <= r_max:
                     x_left2 = x_disp(x_well, target_particle, r, size)
                 else:
                     x_left2 = 2 * x_disp(x_well, target_particle, r_max, size)
-                    u_left = u_left - (u_lj(r_max) - u_lj(r_well))
-                    r = min(r_disp(r_well, u_left)) if min(r_disp(r_well, u_left)) > 0 else max(r_disp(r_well, u_left))
+                    u_left = u_left - (u(r_max) - u(r_well))
+                    r = min(roots(r_well, u_left)) if min(roots(r_well, u_left)) > 0 else max(roots(r_well, u_left))
                     x_left3 = x_disp(x_well, target_particle, r, size)
             if not moving_away:
-                r = min(r_disp(r0, u_left)) if min(r_disp(r0, u_left)) > 0 else max(r_disp(r0, u_left))
+                r = min(roots(r0, u_left)) if min(roots(r0, u_left)) > 0 else max(roots(r0, u_left))
                 if r_min <= r <= r0:
                     x_left1 = x_disp(active_particle, target_particle, r, size)
                 else:
                     x_left1 = x_disp(active_particle, target_particle, r_min, size)
                     x_left2 = x_disp([target_particle[0], active_particle[1]], target_particle, r_well, size)
-                    u_left = u_left - (u_lj(r_min) - u_lj(r0))
-                    r = max(r_disp(r_well, u_left))
+                    u_left = u_left - (u(r_min) - u(r0))
+                    r = max(roots(r_well, u_left))
                     if r_well <= r <= r_max:
                         x_left3 = x_disp(x_well, target_particle, r, size)
                     else:
                         x_left3 = 2 * x_disp(x_well, target_particle, r_max, size)
-                        u_left = u_left - (u_lj(r_max) - u_lj(r_well))
-                        r = min(r_disp(r_well, u_left))
+                        u_left = u_left - (u(r_max) - u(r_well))
+                        r = min(roots(r_well, u_left))
                         x_left4 = x_disp(x_well, target_particle, r, size)
     return size * n_periods + (x_left1 + x_left2 + x_left3 + x_left4)
+
+
+# if Numba is installed, displacement_advanced, delta_u_lj and short_range_u are replaced by their compiled versions
+# (see compiled.py), which give the same results up to rounding errors (the tabulated potential of displacement_advanced
+# is not compiled). The versions above remain available with the prefix python_.
+[python_displacement_advanced, python_delta_u_lj, python_short_range_u] = [displacement_advanced, delta_u_lj,
+                                                                           short_range_u]
+if numba_available:
+    def displacement_advanced(active_particle, target_particle, delta_u, size, table=None):
+        if table is not None:
+            return python_displacement_advanced(active_particle, target_particle, delta_u, size, table)
+        return displacement_xy(active_particle[0], active_particle[1], target_particle[0], target_particle[1], delta_u,
+                               size, sigma, epsilon)
+
+    def delta_u_lj(part, new_part, target_particle, size):
+        return delta_u_xy(part[0], part[1], new_part[0], new_part[1], target_particle[0], target_particle[1], size,
+                          sigma, epsilon)
+
+    def short_range_u(pos, conf, neighbors, i, r_c, size):
+        return list(short_range_u_xy(pos[0], pos[1], conf, np.array(neighbors, dtype=np.intp), i, r_c, size, sigma,
+                                     epsilon))
+
+
+# Walker tables for sampling the index k with probability proportional to weights[k], built with Vose's algorithm
+def walker_tables(weights):
+    n_w = len(weights)
+    w_tot = sum(weights)
+    prob_table = [n_w * w / w_tot for w in weights]
+    alias_table = list(range(n_w))
+    under = [k for k in range(n_w) if prob_table[k] < 1.0]
+    over = [k for k in range(n_w) if prob_table[k] >= 1.0]
+    while over and under:
+        j = under.pop()
+        i = over[-1]
+        alias_table[j] = i
+        prob_table[i] += prob_table[j] - 1.0
+        if prob_table[i] < 1.0:
+            over.pop()
+            under.append(i)
+    # the remaining entries differ from 1.0 only because of rounding errors
+    for k in over + under:
+        prob_table[k] = 1.0
+    return [prob_table, alias_table]
+
+
+# moving particle i from old_cell to new_cell, keeping track of the surplus particles (all the particles of a cell
+# except the first one)
+def move_particle(i, old_cell, new_cell, particle_cells, surplus_particles):
+    old_particles = particle_cells[old_cell]
+    if old_particles[0] != i:
+        surplus_particles.remove(i)
+    elif len(old_particles) > 1:
+        surplus_particles.remove(old_particles[1])
+    old_particles.remove(i)
+    if particle_cells[new_cell]:
+        surplus_particles.add(i)
+    particle_cells[new_cell].append(i)
@@ -0,0 +1,86 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions that accumulate the pair-correlation data in histograms, with n_bins fixed bins
+# between 0 and the largest periodic distance L / sqrt(2). Histograms with the same bins are merged by adding their
+# counts. They are stored in the folder PairCorrelationData/ as .npz files, containing the counts and the bin edges.
+# Besides the distance of one random pair per sample, the histogram of the distances between all pairs of particles
+# closer than a cutoff can be accumulated from snapshots of the configuration, using cell lists.
+#
+import math
+import numpy as np
+from vectorized import per_dist_array
+from cell_lists import cells_per_side, cell_lists, cell_blocks, block_particles
+from checkpoint import atomic_save
+
+n_bins = 500
+
+
+# edges of the bins of the histogram, for a periodic box of side size
+def histogram_edges(size, n_bins=n_bins):
+    return np.linspace(0.0, size / math.sqrt(2.0), n_bins + 1)
+
+
+# index of the bin containing the distance r
+def histogram_bin(r, size, n_bins=n_bins):
+    return min(int(r * math.sqrt(2.0) * n_bins / size), n_bins - 1)
+
+
+# number of bins below the distance r_cut
+def bins_below(r_cut, size, n_bins=n_bins):
+    return min(int(r_cut * math.sqrt(2.0) * n_bins / size), n_bins)
+
+
+# edges of the bins of the snapshot histograms, up to the last edge below r_cut
+def snapshot_edges(size, r_cut, n_bins=n_bins):
+    return histogram_edges(size, n_bins)[:bins_below(r_cut, size, n_bins) + 1]
+
+
+# counts of the distances between all the pairs of particles of conf in the bins below r_cut. Each particle is only
+# compared with the particles of the 3 x 3 block of cells around its own, and each pair is counted once.
+def snapshot_counts(conf, size, r_cut, n_bins=n_bins):
+    n_cut = bins_below(r_cut, size, n_bins)
+    n_c = cells_per_side(size, r_cut)
+    particle_cells = cell_lists(conf, n_c, size)
+    counts = np.zeros(n_cut, dtype=np.int64)
+    for [particles, block] in zip(particle_cells, cell_blocks(n_c)):
+        if not particles:
+            continue
+        neighbors = np.array(block_particles(block, particle_cells))
+        r = per_dist_array(conf[particles][:, np.newaxis], conf[neighbors][np.newaxis], size)
+        r = r[np.array(particles)[:, np.newaxis] < neighbors[np.newaxis]]
+        bins = (r * math.sqrt(2.0) * n_bins / size).astype(int)
+        counts += np.bincount(bins[bins < n_cut], minlength=n_cut)
+    return counts
+
+
+# name of the file containing the histogram of an algorithm
+def histogram_filename(name, N, density):
+    return 'PairCorrelationData/' + name + '_N' + str(N) + '_rho' + str(density) + '_Correlation.npz'
+
+
+# storing the counts and the bin edges of a histogram
+def save_histogram(filename, counts, edges):
+    atomic_save(filename, lambda file: np.savez(file, counts=np.asarray(counts, dtype=np.int64),
+                                                edges=np.asarray(edges, dtype=float)))
+
+
+# stored histogram [counts, edges]
+def load_histogram(filename):
+    with np.load(filename) as data:
+        return [data['counts'], data['edges']]
+
+
+# histogram [counts, edges] obtained by adding the counts of the histograms [counts, edges] with the same bins
+def merge_histograms(histograms):
+    [counts, edges] = [np.zeros_like(histograms[0][0]), histograms[0][1]]
+    for [other_counts, other_edges] in histograms:
+        if not np.array_equal(other_edges, edges):
+            raise ValueError('histograms with different bins cannot be merged')
+        counts = counts + other_counts
+    return [counts, edges]
@@ -0,0 +1,46 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the timers and counters used to profile the event loops of the cell-veto algorithms. The time
+# spent in each phase of the loop and the counters are accumulated in the dictionaries phase_times and counters, and
+# exported as JSON at the end of the run. The programs only call these functions when profiling is enabled (option
+# --profile), so that a disabled profile costs a single test per phase.
+#
+import time
+import json
+
+phase_times = {}
+counters = {}
+
+
+# adding the time elapsed since start to phase, and returning the current time (the start of the following phase)
+def lap(phase, start):
+    now = time.perf_counter()
+    phase_times[phase] = phase_times.get(phase, 0.0) + now - start
+    return now
+
+
+# adding value to a counter
+def count(counter, value=1):
+    counters[counter] = counters.get(counter, 0) + value
+
+
+# discarding the phase times and the counters accumulated so far (at the end of a burn-in)
+def reset_profile():
+    phase_times.clear()
+    counters.clear()
+
+
+# writing the phase times, the counters and the quantities per event (counters divided by counters['events']) to
+# filename
+def save_profile(filename, total_time):
+    n_events = max(counters.get('events', 0), 1)
+    profile = {'total_time': total_time, 'phase_times': phase_times, 'counters': counters,
+               'per_event': {counter: value / n_events for counter, value in counters.items() if counter != 'events'}}
+    with open(filename, 'w') as file:
+        json.dump(profile, file, indent=2)
@@ -14,59 +14,111 @@
 import random
 import math
 import os.path
-from functions import per_dist, u_lj
+import numpy as np
+from arguments import sampler_arguments
+from functions import per_dist, u_lj, du_lj, potential_table, sigma
+from vectorized import pair_delta_u, total_energy
+from histograms import histogram_edges, histogram_bin, histogram_filename, save_histogram, n_bins
+from histograms import snapshot_edges, snapshot_counts, bins_below
+from checkpoint import load_conf, save_conf, load_checkpoint, save_checkpoint, remove_checkpoint
+from checkpoint import checkpoint_filename, replica_filename, save_replica
+from burn_in import window_size, new_tuner, record_moves, adapted_value, frozen_value
 
-N = 100
-density = 0.05
+# N, density, n_samples, the random seed, the tolerance of the tabulated potential and the burn-in can be given on the
+# command line (see arguments.py)
+args = sampler_arguments('Metropolis algorithm', N=100, density=0.05, n_steps=10 ** 2, tabulated=True,
+                         burn_in_criteria=['acceptance', 'displacement'])
+N = args.N
+density = args.density
+random.seed(args.seed)
 L = math.sqrt(N / density)
 delta = 1.0
+# tabulated potential, from half the diameter of the particles to the largest distance in the box (u_lj if None)
+table = None
+if args.tabulated is not None:
+    table = potential_table(u_lj, du_lj, 0.5 * sigma, 2 ** (1 / 6) * sigma, L / math.sqrt(2.0), args.tabulated)
 
 # initial configuration
-filename = 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.data'
-if os.path.isfile(filename):
-    with open(filename, 'r') as file:
-        conf = [list(c) for c in eval(file.readline())]
-else:
-    conf = [[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)]
-
-u_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N) if j != i])
+conf = load_conf(N, density)
+if conf is None:
+    conf = np.array([[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)])
 
-# sampling
-n_samples = 10 ** 2
-u_evals = 0
-distance = 0.0
-acc = 0
-pair_correlations = []
-for sample in range(n_samples):
+# sampling (an interrupted run is resumed from its last checkpoint, written every checkpoint_interval samples). The
+# samples with negative indices form the burn-in, during which delta is adapted (see burn_in.py): at its end, delta is
+# frozen and the counters and histograms are reset.
+n_samples = args.n_samples
+checkpoint_interval = 10 ** 4
+checkpoint_file = checkpoint_filename('Metropolis', N, density, args.replica)
+# every snapshot_interval samples, the distances between all the pairs closer than r_snapshot are added to the
+# snapshot histogram
+snapshot_interval = N
+r_snapshot = 5.0 * sigma
+if os.path.isfile(checkpoint_file):
+    state = load_checkpoint(checkpoint_file)
+    [conf, first_sample, u_test, delta] = [state['conf'], state['sample'], state['u_test'], state.get('delta', delta)]
+    [u_evals, distance, acc] = [state['u_evals'], state['distance'], state['acc']]
+    [pair_counts, snapshot_pair_counts] = [state['pair_counts'], state['snapshot_pair_counts']]
+else:
+    u_test = total_energy(conf, L, table)
+    [first_sample, u_evals, distance, acc] = [-args.burn_in, 0, 0.0, 0]
+    pair_counts = np.zeros(n_bins, dtype=np.int64)
+    snapshot_pair_counts = np.zeros(bins_below(r_snapshot, L), dtype=np.int64)
+tuner = new_tuner(delta, 10 ** (-3) * sigma, L / 2)
+for sample in range(first_sample, n_samples):
     print(sample)
-    part = random.choice(conf)
+    i = random.randint(0, N - 1)
+    part = conf[i]
     [del_x, del_y] = [random.uniform(-delta, delta), random.uniform(-delta, delta)]
     new_part = [(part[0] + del_x) % L, (part[1] + del_y) % L]
-    delta_u = sum([u_lj(per_dist(new_part, c, L)) - u_lj(per_dist(part, c, L)) for c in conf if c != part])
+    delta_u = float(np.sum(pair_delta_u(conf, i, new_part, L, table)))
     u_evals += (2 * (N - 1))
     metr_fil = math.exp(-delta_u) if delta_u > 0.0 else 1.0
-    if random.uniform(0.0, 1.0) < metr_fil:
+    accepted = random.uniform(0.0, 1.0) < metr_fil
+    if accepted:
         acc += 1
         distance += math.sqrt(del_x ** 2 + del_y ** 2)
         u_test += delta_u
         part[:] = new_part
-    pair_part = random.sample(conf, 2)
-    pair_correlations.append(per_dist(pair_part[0], pair_part[1], L))
+    pair_part = random.sample(range(N), 2)
+    pair_counts[histogram_bin(per_dist(conf[pair_part[0]], conf[pair_part[1]], L), L)] += 1
+    if (sample + 1) % snapshot_interval == 0:
+        snapshot_pair_counts += snapshot_counts(conf, L, r_snapshot)
+    if sample < 0:
+        record_moves(tuner, 1, accepted, (del_x ** 2 + del_y ** 2) * accepted, 2 * (N - 1))
+        if (sample + 1) % window_size == 0:
+            delta = adapted_value(tuner, args.criterion, args.target_acceptance)
+        if sample == -1:
+            delta = frozen_value(tuner)
+            [u_evals, distance, acc] = [0, 0.0, 0]
+            [pair_counts[:], snapshot_pair_counts[:]] = [0, 0]
+            print("Burn-in: delta = " + str(delta))
+    elif (sample + 1) % checkpoint_interval == 0:
+        save_checkpoint(checkpoint_file, {'conf': conf, 'sample': sample + 1, 'u_test': u_test, 'u_evals': u_evals,
+                                          'distance': distance, 'acc': acc, 'delta': delta, 'pair_counts': pair_counts,
+                                          'snapshot_pair_counts': snapshot_pair_counts})
 
-u_final = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N) if j != i])
+u_final = total_energy(conf, L, table)
 
 print("Sanity check: |u_test - u_final| = " + str(abs(u_test - u_final)))
 print("Acceptance rate: " + str(acc / n_samples))
 print("Evaluations/distance: " + str(u_evals / distance))
 
-with open(filename, "w") as file:
-    file.write(str(conf))
+# a replica does not modify the stored configuration, and its results are merged by replicas.py
+if args.replica is None:
+    save_conf(conf, N, density)
+else:
+    save_replica(replica_filename('Metropolis', N, density, args.replica),
+                 {'conf': conf, 'u_evals': u_evals, 'distance': distance, 'pair_counts': pair_counts,
+                  'pair_edges': histogram_edges(L), 'snapshot_pair_counts': snapshot_pair_counts,
+                  'snapshot_edges': snapshot_edges(L, r_snapshot)})
+remove_checkpoint(checkpoint_file)
 
 # to produce a file containing scaling data for this algorithm, uncomment the following two lines and run the program
 # several times with different values of N
 # with open('ScalingData/MetropolisScaling_rho' + str(density) + '.data', "a") as file:
 #     file.write(str([N, u_evals / distance]) + '\n')
 
-# to produce a file containing pair-correlation data for this algorithm, uncomment the following two lines
-# with open('PairCorrelationData/Metropolis_N' + str(N) + '_rho' + str(density) + '_Correlation.data', "w") as file:
-#     file.write(str(pair_correlations))
+# to produce files containing pair-correlation data for this algorithm, uncomment the following lines
+# save_histogram(histogram_filename('Metropolis', N, density), pair_counts, histogram_edges(L))
+# save_histogram(histogram_filename('MetropolisFull', N, density), snapshot_pair_counts,
+#                snapshot_edges(L, r_snapshot))
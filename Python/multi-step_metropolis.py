@@ -14,86 +14,145 @@
 import math
 import random
 import os.path
-from functions import u_lj, per_dist, sigma
+import numpy as np
+from arguments import sampler_arguments, n_short_default, multi_step_name
+from functions import u_lj, per_dist, short_range_u, sigma
+from vectorized import long_range_delta_u
+from cell_lists import cells_per_side, cell_index, cell_lists, cell_blocks, block_particles
+from histograms import histogram_edges, histogram_bin, histogram_filename, save_histogram, n_bins
+from histograms import snapshot_edges, snapshot_counts, bins_below
+from checkpoint import load_conf, save_conf, load_checkpoint, save_checkpoint, remove_checkpoint
+from checkpoint import checkpoint_filename, replica_filename, save_replica
+from checkpoint import flat_cells, nested_cells
+from burn_in import window_size, new_tuner, record_moves, reset_window, adapted_value, frozen_value
 
-N = 100
-density = 0.05
+# N, density, n_samples, the random seed and the burn-in can be given on the command line (see arguments.py)
+args = sampler_arguments('multi-time-step Metropolis algorithm', N=100, density=0.05, n_steps=10 ** 2,
+                         burn_in_criteria=['acceptance', 'displacement'])
+N = args.N
+density = args.density
+random.seed(args.seed)
 L = math.sqrt(N / density)
 delta = 1.0
 r_c = 1.3 * sigma
-n_short = 4
+n_short = n_short_default
 
 # initial configuration
-filename = 'InitialConfs/N' + str(N) + '_rho' + str(density) + '.data'
-if os.path.isfile(filename):
-    with open(filename, 'r') as file:
-        conf = [list(c) for c in eval(file.readline())]
-else:
-    conf = [[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)]
-
-u_short_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N)
-                    if 0 < per_dist(conf[i], conf[j], L) < r_c])
-u_long_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N)
-                   if per_dist(conf[i], conf[j], L) >= r_c])
+conf = load_conf(N, density)
+if conf is None:
+    conf = np.array([[random.uniform(0.0, L), random.uniform(0.0, L)] for i in range(N)])
+# cell lists with cells of side at least r_c, so that the short-range neighbors of a particle are in the 3 x 3 block
+# of cells around it
+n_c = cells_per_side(L, r_c)
+blocks = cell_blocks(n_c)
 
-# sampling
-n_samples = 10 ** 2
-u_evals = 0
-distance = 0.0
-short_acc = 0
-long_acc = 0
-pair_correlations = []
-for sample in range(n_samples):
+# sampling (an interrupted run is resumed from its last checkpoint, written every checkpoint_interval samples). The
+# samples with negative indices form the burn-in (see burn_in.py), whose windows alternately adapt delta (toward the
+# target acceptance rate of the short-range steps, or toward the maximum mean-squared displacement per evaluation) and
+# n_short (toward the maximum mean-squared displacement per evaluation): at its end, both are frozen and the counters
+# and histograms are reset.
+n_samples = args.n_samples
+checkpoint_interval = 10 ** 4
+# the checkpoint is named after the initial value of n_short (which may be changed by the burn-in), and the output files
+# after its final value
+checkpoint_file = checkpoint_filename(multi_step_name(n_short), N, density, args.replica)
+# every snapshot_interval samples, the distances between all the pairs closer than r_snapshot are added to the
+# snapshot histogram
+snapshot_interval = N
+r_snapshot = 5.0 * sigma
+if os.path.isfile(checkpoint_file):
+    state = load_checkpoint(checkpoint_file)
+    [conf, first_sample, u_short_test, u_long_test] = [state['conf'], state['sample'], state['u_short_test'],
+                                                       state['u_long_test']]
+    [u_evals, distance, short_acc, long_acc] = [state['u_evals'], state['distance'], state['short_acc'],
+                                                state['long_acc']]
+    [delta, n_short] = [state.get('delta', delta), state.get('n_short', n_short)]
+    particle_cells = nested_cells(state['cell_particles'], state['cell_counts'])
+    [pair_counts, snapshot_pair_counts] = [state['pair_counts'], state['snapshot_pair_counts']]
+else:
+    particle_cells = cell_lists(conf, n_c, L)
+    u_short_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N)
+                        if 0 < per_dist(conf[i], conf[j], L) < r_c])
+    u_long_test = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N)
+                       if per_dist(conf[i], conf[j], L) >= r_c])
+    [first_sample, u_evals, distance, short_acc, long_acc] = [-args.burn_in, 0, 0.0, 0, 0]
+    pair_counts = np.zeros(n_bins, dtype=np.int64)
+    snapshot_pair_counts = np.zeros(bins_below(r_snapshot, L), dtype=np.int64)
+[delta_tuner, n_short_tuner] = [new_tuner(delta, 10 ** (-3) * sigma, L / 2), new_tuner(n_short, 1, N, integer=True)]
+for sample in range(first_sample, n_samples):
     print(sample)
     Y_old = {}  # keeping track of the particles that are displaced with short-range moves
     # short-range steps
     delta_u_short = 0.0
     dist_short = 0.0
+    [squared_dist_short, sample_evals, sample_short_acc] = [0.0, u_evals, short_acc]
     for n_s in range(n_short):
         i = random.randint(0, N - 1)
-        part = conf[i]
+        part = conf[i].copy()
         [del_x, del_y] = [random.uniform(-delta, delta), random.uniform(-delta, delta)]
         new_part = ((part[0] + del_x) % L, (part[1] + del_y) % L)
-        u_short_old = 0.0
-        u_short_new = 0.0
-        for j in list(range(i)) + list(range(i + 1, N)):
-            if per_dist(conf[i], conf[j], L) < r_c:
-                u_short_old += u_lj(per_dist(conf[i], conf[j], L))
-                u_evals += 1
-            if per_dist(new_part, conf[j], L) < r_c:
-                u_evals += 1
-                u_short_new += u_lj(per_dist(new_part, conf[j], L))
+        old_cell = cell_index(part, n_c, L)
+        new_cell = cell_index(new_part, n_c, L)
+        old_neighbors = block_particles(blocks[old_cell], particle_cells)
+        new_neighbors = block_particles(blocks[new_cell], particle_cells)
+        [u_short_old, n_evals_old] = short_range_u(part, conf, old_neighbors, i, r_c, L)
+        [u_short_new, n_evals_new] = short_range_u(new_part, conf, new_neighbors, i, r_c, L)
+        u_evals += n_evals_old + n_evals_new
         metr_fil_short = math.exp(-(u_short_new - u_short_old)) if u_short_new - u_short_old > 0.0 else 1.0
         if random.uniform(0.0, 1.0) < metr_fil_short:
             short_acc += 1
             dist_short += math.sqrt(del_x ** 2 + del_y ** 2)
+            squared_dist_short += del_x ** 2 + del_y ** 2
             delta_u_short += (u_short_new - u_short_old)
             conf[i] = new_part
+            particle_cells[old_cell].remove(i)
+            particle_cells[new_cell].append(i)
             if i not in Y_old:
                 Y_old[i] = part  # part has not been moved yet
     # long-range decision
-    delta_u_long = 0.0
-    for i in Y_old:
-        for j in list(range(i)) + list(range(i + 1, N)):
-            alpha = 0.5 if j in Y_old else 1.0
-            if per_dist(conf[i], conf[j], L) >= r_c:
-                delta_u_long += alpha * u_lj(per_dist(conf[i], conf[j], L))
-                u_evals += 1
-            target = Y_old[j] if j in Y_old else conf[j]
-            if per_dist(Y_old[i], target, L) >= r_c:
-                delta_u_long -= alpha * u_lj(per_dist(Y_old[i], target, L))
-                u_evals += 1
+    moved = list(Y_old)
+    [delta_u_long, n_evals] = long_range_delta_u(conf, moved, np.array([Y_old[i] for i in moved]).reshape(-1, 2),
+                                                 r_c, L)
+    u_evals += n_evals
     metr_fil_long = math.exp(-delta_u_long) if delta_u_long > 0.0 else 1.0
-    if random.uniform(0.0, 1.0) > metr_fil_long:
+    accepted = random.uniform(0.0, 1.0) <= metr_fil_long
+    if not accepted:
         for i in Y_old:
+            particle_cells[cell_index(conf[i], n_c, L)].remove(i)
+            particle_cells[cell_index(Y_old[i], n_c, L)].append(i)
             conf[i] = Y_old[i]
     else:
         long_acc += 1
         distance += dist_short
         u_short_test += delta_u_short
         u_long_test += delta_u_long
-    pair_part = random.sample(conf, 2)
-    pair_correlations.append(per_dist(pair_part[0], pair_part[1], L))
+    pair_part = random.sample(range(N), 2)
+    pair_counts[histogram_bin(per_dist(conf[pair_part[0]], conf[pair_part[1]], L), L)] += 1
+    if (sample + 1) % snapshot_interval == 0:
+        snapshot_pair_counts += snapshot_counts(conf, L, r_snapshot)
+    if sample < 0:
+        record_moves(delta_tuner, n_short, short_acc - sample_short_acc, squared_dist_short * accepted,
+                     u_evals - sample_evals)
+        record_moves(n_short_tuner, 1, accepted, squared_dist_short * accepted, u_evals - sample_evals)
+        if (sample + 1) % window_size == 0 and (sample + 1) // window_size % 2 == 0:
+            delta = adapted_value(delta_tuner, args.criterion, args.target_acceptance)
+            reset_window(n_short_tuner)
+        elif (sample + 1) % window_size == 0:
+            n_short = adapted_value(n_short_tuner, 'displacement', args.target_acceptance)
+            reset_window(delta_tuner)
+        if sample == -1:
+            [delta, n_short] = [frozen_value(delta_tuner), frozen_value(n_short_tuner)]
+            [u_evals, distance, short_acc, long_acc] = [0, 0.0, 0, 0]
+            [pair_counts[:], snapshot_pair_counts[:]] = [0, 0]
+            print("Burn-in: delta = " + str(delta) + ", n_short = " + str(n_short))
+    elif (sample + 1) % checkpoint_interval == 0:
+        [cell_particles, cell_counts] = flat_cells(particle_cells)
+        save_checkpoint(checkpoint_file, {'conf': conf, 'sample': sample + 1, 'u_short_test': u_short_test,
+                                          'u_long_test': u_long_test, 'u_evals': u_evals, 'distance': distance,
+                                          'short_acc': short_acc, 'long_acc': long_acc, 'delta': delta,
+                                          'n_short': n_short,
+                                          'cell_particles': cell_particles, 'cell_counts': cell_counts,
+                                          'pair_counts': pair_counts, 'snapshot_pair_counts': snapshot_pair_counts})
 
 u_short_final = sum([u_lj(per_dist(conf[i], conf[j], L)) for i in range(N) for j in range(i, N)
                      if 0 < per_dist(conf[i], conf[j], L) < r_c])
@@ -106,14 +165,23 @@ print("Short-range acceptance rate: " + str(short_acc / (n_samples * n_short)))
 print("Long-range acceptance rate: " + str(long_acc / n_samples))
 print("Evaluations/distance: " + str(u_evals / distance))
 
-with open(filename, "w") as file:
-    file.write(str(conf))
+# a replica does not modify the stored configuration, and its results are merged by replicas.py
+name = multi_step_name(n_short)
+if args.replica is None:
+    save_conf(conf, N, density)
+else:
+    save_replica(replica_filename(name, N, density, args.replica),
+                 {'conf': conf, 'u_evals': u_evals, 'distance': distance, 'pair_counts': pair_counts,
+                  'pair_edges': histogram_edges(L), 'snapshot_pair_counts': snapshot_pair_counts,
+                  'snapshot_edges': snapshot_edges(L, r_snapshot)})
+remove_checkpoint(checkpoint_file)
 
 # to produce a file containing scaling data for this algorithm, uncomment the following two lines and run the program
 # several times with different values of N
-# with open('ScalingData/MultiStep' + str(n_short) + 'Scaling_rho' + str(density) + '.data', "a") as file:
+# with open('ScalingData/' + name + 'Scaling_rho' + str(density) + '.data', "a") as file:
 #     file.write(str([N, u_evals / distance]) + '\n')
 
-# to produce a file containing pair-correlation data for this algorithm, uncomment the following two lines
-# with open('PairCorrelationData/MultiStep' + str(n_short) + '_N' + str(N) + '_rho' + str(density) + '_Correlation.data', "w") as file:
-#     file.write(str(pair_correlations))
+# to produce files containing pair-correlation data for this algorithm, uncomment the following lines
+# save_histogram(histogram_filename(name, N, density), pair_counts, histogram_edges(L))
+# save_histogram(histogram_filename(name + 'Full', N, density), snapshot_pair_counts,
+#                snapshot_edges(L, r_snapshot))
@@ -6,14 +6,14 @@
 # License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
 # version (see the LICENSE file).
 #
-# This program produces an histogram of pair-correlation data, stored in the folder PairCorrelationData/, for
-# different Markov chain algorithms.
-# To draw a cumulative histogram, set the "cumulative" parameter to "True" on line 24
+# This program produces an histogram of pair-correlation data, stored in the folder PairCorrelationData/ as bin counts,
+# for different Markov chain algorithms.
+# To draw a cumulative histogram, set the "cumulative" parameter to "True" on line 35
 #
-import numpy as np
 from matplotlib import pyplot
 import glob
 import scienceplots
+from histograms import load_histogram
 
 pyplot.style.use("science")
 
@@ -25,11 +25,15 @@ title = r"$N = $" + str(N) + r"$, \, \rho = $" + str(density)
 fig, ax = pyplot.subplots(figsize=(7, 5))
 ax.set_xlabel(r"$|\Delta r|$", fontsize=20)
 ax.set_ylabel(r"$\pi(|\Delta r|)$", fontsize=20)
-for file in glob.glob("PairCorrelationData/*_N" + str(N) + "_rho" + str(density) + "*_Correlation.data"):
+files = glob.glob("PairCorrelationData/*_N" + str(N) + "_rho" + str(density) + "*_Correlation.npz")
+histograms = [load_histogram(file) for file in files]
+# the histograms of all the pairs closer than a cutoff (files *Full_N...) only cover the distances below it, so that
+# all the histograms are restricted to the bins they have in common before being normalized
+n_common = min([len(counts) for [counts, edges] in histograms])
+for file, [counts, edges] in zip(files, histograms):
     label = file.split("_")[0][20:]
-    data = eval(open(file).readline())
-    bins_x = np.linspace(min(data), max(data), 100)
-    ax.hist(data, bins_x, label=label, density=True, cumulative=False, histtype="step")
+    ax.hist(edges[:n_common], edges[:n_common + 1], weights=counts[:n_common], density=True, cumulative=False,
+            histtype="step", label=label)
 ax.legend(fontsize=16)
 ax.set_title(title, fontsize=18)
 pyplot.show()
@@ -0,0 +1,56 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the function running a Markov-chain algorithm in a temporary folder and measuring its
+# performance, shared by benchmark.py and autotune.py. The stored configurations, tables and checkpoints are neither
+# used nor modified, unless they are explicitly copied to or from the temporary folder.
+#
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+folders = ['InitialConfs', 'Checkpoints', 'CellTables', 'PairCorrelationData', 'ScalingData', 'Tunings']
+
+
+# running program with the command-line arguments in a new temporary folder, into which the files inputs are copied,
+# and measuring its performance. The programs print the index of each sample (or chain), so that the first printed line
+# marks the end of the startup and the first other line the end of the sampling. Times are given in seconds. The files
+# outputs(directory), relative to the temporary folder, are copied back to the current folder if they are missing there.
+def run_pilot(program, arguments, inputs=(), outputs=None):
+    command = [sys.executable, os.path.abspath(program)] + [str(argument) for argument in arguments]
+    with tempfile.TemporaryDirectory() as directory:
+        for folder in folders:
+            os.mkdir(os.path.join(directory, folder))
+        for filename in inputs:
+            if os.path.isfile(filename):
+                shutil.copy(filename, os.path.join(directory, filename))
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=directory, stdout=subprocess.PIPE, text=True,
+                                   env=dict(os.environ, PYTHONUNBUFFERED='1'))
+        [startup, sampling_end, distance, evals_per_distance] = [None, None, None, None]
+        for line in process.stdout:
+            if startup is None:
+                startup = time.perf_counter() - start
+            if sampling_end is None and not line.strip().isdigit():
+                sampling_end = time.perf_counter() - start
+            if line.startswith('Distance: '):
+                distance = float(line.split()[-1])
+            if line.startswith('Evaluations/distance: '):
+                evals_per_distance = float(line.split()[-1])
+        # the resource usage of this process only (its peak memory is given in kB)
+        [pid, status, usage] = os.wait4(process.pid, 0)
+        if os.waitstatus_to_exitcode(status) != 0 or evals_per_distance is None:
+            raise RuntimeError(' '.join(command) + ' failed')
+        for filename in outputs(directory) if outputs is not None else []:
+            if not os.path.isfile(filename):
+                shutil.copy(os.path.join(directory, filename), filename)
+    return {'startup_time': startup, 'sampling_time': sampling_end - startup, 'distance': distance,
+            'evals_per_distance': evals_per_distance, 'peak_memory_mb': usage.ru_maxrss / 1024}
@@ -7,11 +7,53 @@
 # version (see the LICENSE file).
 #
 # This program implements both Algorithm 5 (poisson-veto) and Algorithm 6
-# (poisson-veto(patch)) in the manuscript in a pedagogical way, and compares their outcomes.
-# The probabilities q are simply generated as random numbers.
+# (poisson-veto(patch)) in the manuscript in a pedagogical way, and compares their outcomes with those of the batched
+# versions of the two algorithms in vectorized.py. The probabilities q are simply generated as random numbers.
+# Finally, the cost per trial of the four implementations is measured as a function of the number of factors.
 #
 import random
 import math
+import time
+import numpy as np
+from functions import walker_tables
+from vectorized import naive_veto_counts, patch_veto_counts
+
+
+# poisson-veto: number of trials in which each factor belongs to the veto set
+def naive_veto_loop(intensities, n_trials):
+    N = len(intensities)
+    histo_naive = {i: 0 for i in range(N)}
+    for n in range(n_trials):
+        S_veto = []
+        for i in range(N):
+            lambda_i = intensities[i]
+            t = -math.log(random.random()) / lambda_i
+            if t < 1.0:
+                S_veto.append(i)
+                histo_naive[i] += 1
+    return [histo_naive[i] for i in range(N)]
+
+
+# poisson-veto(patch): number of trials in which each factor belongs to the veto set
+def patch_veto_loop(prob_table, alias_table, lambda_tot, n_trials):
+    N = len(prob_table)
+    histo_patch = {i: 0 for i in range(N)}
+    for n in range(n_trials):
+        S_veto = set()
+        t = 0.0
+        while True:
+            t += (-math.log(random.random()) / lambda_tot)
+            if t > 1.0:
+                break
+            j = random.choice(range(N))
+            if random.random() < prob_table[j]:
+                S_veto.add(j)
+            else:
+                S_veto.add(alias_table[j])
+        for j in S_veto:
+            histo_patch[j] += 1
+    return [histo_patch[i] for i in range(N)]
+
 
 N = 5
 q_probs = [random.random() for i in range(N)]
@@ -19,58 +61,45 @@ intensities = [-math.log(1 - q) for q in q_probs]
 print('Rejection probabilities: ' + str(q_probs))
 
 n_trials = 10 ** 7
+n_trials_loop = 10 ** 5  # the pure-Python loops are much slower than the batched versions
+rng = np.random.default_rng()
 
 # poisson-veto
-histo_naive = {i: 0 for i in range(N)}
-for n in range(n_trials):
-    S_veto = []
-    for i in range(N):
-        lambda_i = intensities[i]
-        t = -math.log(random.random()) / lambda_i
-        if t < 1.0:
-            S_veto.append(i)
-            histo_naive[i] += 1
-naive_probs = [histo_naive[i] / n_trials for i in range(N)]
+naive_probs = [h / n_trials_loop for h in naive_veto_loop(intensities, n_trials_loop)]
 print('Experimental probabilities (naive): ' + str(naive_probs))
+naive_probs = (naive_veto_counts(intensities, n_trials, rng) / n_trials).tolist()
+print('Experimental probabilities (naive, batched): ' + str(naive_probs))
 
 # constructing Walker tables
 lambda_tot = sum(intensities)
-lambda_probs = [lambda_i / lambda_tot for lambda_i in intensities]
-prob_table = [N * lambda_prob for lambda_prob in lambda_probs]
-alias_table = [k for k in range(N)]
-over = []
-under = []
-for s in range(N):
-    if prob_table[s] > 1.0:
-        over.append(s)
-    elif prob_table[s] < 1.0:
-        under.append(s)
-while over and under:
-    i = random.choice(over)
-    j = random.choice(under)
-    alias_table[j] = i
-    under.remove(j)
-    prob_table[i] += prob_table[j] - 1.0
-    if prob_table[i] <= 1.0:
-        over.remove(i)
-    if prob_table[i] < 1.0:
-        under.append(i)
+[prob_table, alias_table] = walker_tables(intensities)
 
 # poisson-veto(patch)
-histo_patch = {i: 0 for i in range(N)}
-for n in range(n_trials):
-    S_veto = set()
-    t = 0.0
-    while True:
-        t += (-math.log(random.random()) / lambda_tot)
-        if t > 1.0:
-            break
-        j = random.choice(range(N))
-        if random.random() < prob_table[j]:
-            S_veto.add(j)
-        else:
-            S_veto.add(alias_table[j])
-    for j in S_veto:
-        histo_patch[j] += 1
-patch_probs = [histo_patch[i] / n_trials for i in range(N)]
+patch_probs = [h / n_trials_loop for h in patch_veto_loop(prob_table, alias_table, lambda_tot, n_trials_loop)]
 print('Experimental probabilities (patch): ' + str(patch_probs))
+patch_probs = (patch_veto_counts(prob_table, alias_table, lambda_tot, n_trials, rng) / n_trials).tolist()
+print('Experimental probabilities (patch, batched): ' + str(patch_probs))
+
+# cost per trial as a function of the number of factors, for intensities with a fixed sum lambda_bench (as for the
+# cell rates of a finer and finer grid of cells)
+lambda_bench = 1.0
+print('Time per trial in seconds (naive, patch, naive batched, patch batched):')
+for n_factors in [5, 50, 500, 5000]:
+    weights = [random.random() for i in range(n_factors)]
+    bench_intensities = [lambda_bench * w / sum(weights) for w in weights]
+    [bench_prob_table, bench_alias_table] = walker_tables(bench_intensities)
+    n_bench = max(10 ** 5 // n_factors, 10)
+    times = []
+    start = time.perf_counter()
+    naive_veto_loop(bench_intensities, n_bench)
+    times.append((time.perf_counter() - start) / n_bench)
+    start = time.perf_counter()
+    patch_veto_loop(bench_prob_table, bench_alias_table, lambda_bench, 10 ** 4)
+    times.append((time.perf_counter() - start) / 10 ** 4)
+    start = time.perf_counter()
+    naive_veto_counts(bench_intensities, 10 * n_bench, rng)
+    times.append((time.perf_counter() - start) / (10 * n_bench))
+    start = time.perf_counter()
+    patch_veto_counts(bench_prob_table, bench_alias_table, lambda_bench, 10 ** 6, rng)
+    times.append((time.perf_counter() - start) / 10 ** 6)
+    print(str(n_factors) + ' factors: ' + str(times))
@@ -0,0 +1,67 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program runs n_replicas independent replicas of one Markov-chain algorithm, in parallel on n_processes
+# processes. All the replicas start from the configuration stored in InitialConfs/, each with its own random seed and
+# its own checkpoint, and they store their results in the folder Replicas/ instead of modifying the stored
+# configuration. Once all of them are completed, their pair-correlation histograms and their numbers of evaluations
+# and distances are merged, the histograms are written to PairCorrelationData/, and the final configuration of the
+# first replica replaces the stored one. Replicas that were already completed are not run again.
+#
+import os
+import sys
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from arguments import program_names
+from checkpoint import save_conf, replica_filename, load_replica
+from histograms import histogram_filename, save_histogram, merge_histograms
+
+algorithm = 'metropolis.py'
+N = 100
+density = 0.05
+n_replicas = os.cpu_count()
+n_steps = 10 ** 4  # number of samples (or chains, for EC_cell-veto.py) of each replica
+n_processes = os.cpu_count()
+seed = 1
+
+name = program_names[algorithm]
+# independent seeds for the replicas
+seeds = np.random.SeedSequence(seed).generate_state(n_replicas).tolist()
+
+
+# running one replica, unless its results are already stored
+def run_replica(replica):
+    if os.path.isfile(replica_filename(name, N, density, replica)):
+        return
+    n_option = '--n_chains' if algorithm == 'EC_cell-veto.py' else '--n_samples'
+    command = [sys.executable, algorithm, '--N', str(N), '--density', str(density), n_option, str(n_steps), '--seed',
+               str(seeds[replica]), '--replica', str(replica)]
+    # the replicas already occupy all the processes
+    if algorithm in ['MC_cell-veto.py', 'EC_cell-veto.py']:
+        command += ['--n_processes', '1']
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+
+
+with ThreadPoolExecutor(n_processes) as executor:
+    list(executor.map(run_replica, range(n_replicas)))
+
+results = [load_replica(replica_filename(name, N, density, replica)) for replica in range(n_replicas)]
+u_evals = sum([result['u_evals'] for result in results])
+distance = sum([result['distance'] for result in results])
+print("Evaluations/distance (" + str(n_replicas) + " replicas): " + str(u_evals / distance))
+print("Standard error of evaluations/distance: " +
+      str(np.std([result['u_evals'] / result['distance'] for result in results], ddof=1) / math.sqrt(n_replicas)))
+
+for [suffix, counts, edges] in [['', 'pair_counts', 'pair_edges'], ['Full', 'snapshot_pair_counts', 'snapshot_edges']]:
+    [merged_counts, merged_edges] = merge_histograms([[result[counts], result[edges]] for result in results])
+    save_histogram(histogram_filename(name + suffix, N, density), merged_counts, merged_edges)
+save_conf(results[0]['conf'], N, density)
+for replica in range(n_replicas):
+    os.remove(replica_filename(name, N, density, replica))
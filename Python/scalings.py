@@ -25,14 +25,14 @@ ax.set_ylabel("Energy evaluations per displacement", fontsize=20)
 ax.set_xscale("log")
 ax.set_yscale("log")
 markers = ["d", "o", "v", "^", "X"]
-for file in glob.glob('ScalingData/*.data'):
-    j = glob.glob('ScalingData/*.data').index(file)
+# only the data of the given density are plotted
+for j, file in enumerate(glob.glob('ScalingData/*Scaling_rho' + str(density) + '.data')):
     label = file.split("_")[0][12:-7]
     data = [eval(line.rstrip()) for line in open(file, 'r')]
     data.sort()
     n_particles = [d[0] for d in data]
     scaling_data = [d[1] for d in data]
-    ax.plot(n_particles, scaling_data, label=label, linestyle='-', marker=markers[j], markersize=10)
+    ax.plot(n_particles, scaling_data, label=label, linestyle='-', marker=markers[j % len(markers)], markersize=10)
 pyplot.legend(fontsize=16)
 ax.set_title(title, fontsize=18)
 pyplot.show()
@@ -0,0 +1,100 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program runs the Markov-chain algorithms for all the combinations of the values of N and density given below,
+# and appends the number of evaluations per unit distance of each run to the files of the folder ScalingData/, which
+# are plotted with scalings.py. The runs are independent jobs, executed in parallel on n_processes processes, each with
+# its own random seed. They are run as replicas (see replicas.py), so that they all start from the configuration stored
+# in InitialConfs/ without modifying it, and the sweep is reproduced from its seeds. For the values of N and density
+# without a stored configuration, an equilibration run of equilibration_algorithm (which stores its final
+# configuration) is executed first, so that the measured runs do not start from the initial lattice or random
+# configuration. Each job stores its results in
+# Replicas/ and has its own checkpoint (see checkpoint.py), so that an interrupted sweep is resumed by running this
+# program again: the completed jobs are not run again, and the results are only appended to ScalingData/ (and the
+# files of the jobs removed) once all the jobs are completed.
+#
+import os
+import sys
+import random
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from arguments import program_names
+from checkpoint import replica_filename, load_replica, conf_filename
+
+algorithms = ['metropolis.py', 'factorized_metropolis.py', 'multi-step_metropolis.py', 'MC_cell-veto.py',
+              'EC_cell-veto.py']
+N_values = [25, 50, 100, 200, 400]
+densities = [0.05]
+n_samples = 10 ** 4  # number of samples of the Metropolis and reversible cell-veto algorithms
+n_chains = 10 ** 2  # number of chains of the non-reversible cell-veto algorithm
+n_processes = os.cpu_count()
+sweep_replica = 10 ** 6  # index of the replicas run by the sweep, distinct from those of replicas.py
+equilibration_algorithm = 'metropolis.py'
+equilibration_sweeps = 10 ** 3  # number of samples of the equilibration runs, per particle
+random.seed(1)
+
+
+# running the equilibration for N and density, which stores the configuration used by the jobs (an interrupted
+# equilibration is resumed from its checkpoint)
+def equilibrate(N, density, seed):
+    command = [sys.executable, equilibration_algorithm, '--N', str(N), '--density', str(density), '--seed', str(seed),
+               '--n_samples', str(equilibration_sweeps * N)]
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+
+
+# name of the file containing the results of a job
+def job_filename(algorithm, N, density):
+    return replica_filename(program_names[algorithm], N, density, sweep_replica)
+
+
+# running one job (unless it was completed by an interrupted sweep), and returning its number of evaluations per unit
+# distance
+def run_job(algorithm, N, density, seed):
+    if not os.path.isfile(job_filename(algorithm, N, density)):
+        n_steps = ['--n_chains', str(n_chains)] if algorithm == 'EC_cell-veto.py' else ['--n_samples', str(n_samples)]
+        command = [sys.executable, algorithm, '--N', str(N), '--density', str(density), '--seed', str(seed),
+                   '--replica', str(sweep_replica)] + n_steps
+        # the jobs already occupy all the processes
+        if algorithm in ['MC_cell-veto.py', 'EC_cell-veto.py']:
+            command += ['--n_processes', '1']
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    result = load_replica(job_filename(algorithm, N, density))
+    return result['u_evals'] / result['distance']
+
+
+# the largest systems are started first, so that the processes are kept busy until the end of the sweep (the seeds of
+# the jobs do not depend on the equilibrations that are needed)
+systems = [(N, density, random.getrandbits(32)) for N in sorted(N_values, reverse=True) for density in densities]
+jobs = [(algorithm, N, density, random.getrandbits(32)) for N in sorted(N_values, reverse=True)
+        for density in densities for algorithm in algorithms]
+with ThreadPoolExecutor(n_processes) as executor:
+    futures = [executor.submit(equilibrate, *system) for system in systems
+               if not os.path.isfile(conf_filename(system[0], system[1]))]
+    for future in futures:
+        future.result()
+
+results = {}
+with ThreadPoolExecutor(n_processes) as executor:
+    futures = {executor.submit(run_job, *job): job for job in jobs}
+    for future in as_completed(futures):
+        [algorithm, N, density, seed] = futures[future]
+        if future.exception() is not None:
+            print(future.exception())
+            continue
+        results[(algorithm, N, density)] = future.result()
+        print(algorithm + ', N = ' + str(N) + ', density = ' + str(density) + ': ' + str(future.result()))
+
+# the results are appended (in the order of the jobs) only if all the jobs were completed
+if len(results) == len(jobs):
+    for [algorithm, N, density, seed] in jobs:
+        with open('ScalingData/' + program_names[algorithm] + 'Scaling_rho' + str(density) + '.data', "a") as file:
+            file.write(str([N, results[(algorithm, N, density)]]) + '\n')
+    for [algorithm, N, density, seed] in jobs:
+        os.remove(job_filename(algorithm, N, density))
+else:
+    print(str(len(jobs) - len(results)) + ' jobs failed: run the sweep again to complete it')
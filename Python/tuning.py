@@ -0,0 +1,37 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains the functions handling the parameters of the cell-veto algorithms chosen by autotune.py (the
+# number of cells per side n and, for the non-reversible algorithm, the chain length). They are stored as JSON in the
+# folder Tunings/ for each algorithm, N and density, together with the measurements of the pilot runs, and are read by
+# the programs at the start of each run.
+#
+import os
+import json
+from checkpoint import atomic_save
+
+
+# name of the file of the parameters chosen for an algorithm
+def tuning_filename(name, N, density):
+    return 'Tunings/' + name + '_N' + str(N) + '_rho' + str(density) + '.json'
+
+
+# writing the chosen parameters and the measurements of the pilot runs
+def save_tuning(name, N, density, parameters, pilots):
+    atomic_save(tuning_filename(name, N, density),
+                lambda file: json.dump({'parameters': parameters, 'pilots': pilots}, file, indent=2), 'w')
+
+
+# parameters of an algorithm: the values chosen by autotune.py, if they are stored, and the defaults otherwise
+def tuned_parameters(name, N, density, defaults):
+    filename = tuning_filename(name, N, density)
+    if not os.path.isfile(filename):
+        return dict(defaults)
+    with open(filename, 'r') as file:
+        parameters = json.load(file)['parameters']
+    return {key: type(value)(parameters.get(key, value)) for key, value in defaults.items()}
@@ -0,0 +1,348 @@
+# MCLongRange - repository accompanying the manuscript "Markov-chain sampling for long-range systems without
+# evaluating the energy" by Gabriele Tartero & Werner Krauth - https://github.com/jellyfysh/MCLongRange
+# Copyright (C) 2024 The JeLLyFysh organization
+#
+# MCLongRange is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version (see the LICENSE file).
+#
+# This program contains NumPy versions of the auxiliary functions in functions.py, acting on configurations stored as
+# (N, 2) arrays of positions. They compute the same quantities as their scalar counterparts, but for many pairs of
+# particles at once. It also contains batched versions of Algorithms 5 (poisson-veto) and 6 (poisson-veto(patch)),
+# which sample the veto sets of many trials at once, and a version of the latter that samples all the factors of a
+# single veto set at once.
+#
+import random
+import numpy as np
+from functions import sigma, epsilon, per_dist, u_lj, table_u, table_root, displacement_advanced
+
+# number of target particles (or of factors) below which displacement_advanced_array (or patch_veto_set) falls back to
+# scalar code, which is faster for a handful of them because of the overhead of each NumPy operation
+n_batch_min = 32
+# same for the pair partners of subset_pair_delta_u, whose NumPy code has fewer operations, so that it is faster
+# already for a few partners
+n_pair_min = 8
+
+
+# periodic distances between point a and each of the points b (one per row) in a box of arbitrary size
+def per_dist_array(a, b, size):
+    x_distances = np.abs(b - a)
+    x_distances = np.minimum(x_distances, size - x_distances)
+    return np.sqrt(np.sum(x_distances ** 2, axis=-1))
+
+
+# Lennard-Jones potential for an array of distances
+def u_lj_array(r):
+    return 4.0 * epsilon * ((sigma / r) ** 12 - (sigma / r) ** 6)
+
+
+# tabulated potential (see potential_table in functions.py) for an array of distances
+def table_u_array(table, r):
+    u = np.empty_like(r)
+    outside = (r < table['r_lo']) | (r > table['r_hi'])
+    u[outside] = table['u'](r[outside])
+    for [segment, inside] in [[table['inner'], ~outside & (r < table['r_well'])],
+                              [table['outer'], ~outside & (r >= table['r_well'])]]:
+        x = (r[inside] - segment['r_lo']) / segment['h']
+        k = np.minimum(x.astype(np.intp), segment['n'] - 1)
+        t = x - k
+        c = segment['array'][k]
+        u[inside] = c[:, 0] + t * (c[:, 1] + t * (c[:, 2] + t * c[:, 3]))
+    return u
+
+
+# pair potential for an array of distances: u_lj, or the tabulated potential if table is given
+def u_pair_array(r, table=None):
+    return u_lj_array(r) if table is None else table_u_array(table, r)
+
+
+# variations of u_lj (or of the tabulated potential) between particle i and all other particles, when particle i is
+# moved to new_pos
+def pair_delta_u(conf, i, new_pos, size, table=None):
+    others = np.delete(conf, i, axis=0)
+    return (u_pair_array(per_dist_array(new_pos, others, size), table) -
+            u_pair_array(per_dist_array(conf[i], others, size), table))
+
+
+# variations of u_lj (or of the tabulated potential) between particle i and each of the particles js, when particle i
+# is moved to new_pos
+def subset_pair_delta_u(conf, i, new_pos, js, size, table=None, n_min=n_pair_min):
+    if len(js) < n_min:
+        u = u_lj if table is None else (lambda r: table_u(table, r))
+        old_pos = conf[i].tolist()
+        return np.array([u(per_dist(new_pos, pos, size)) - u(per_dist(old_pos, pos, size))
+                         for pos in conf[js].tolist()])
+    others = conf[js]
+    return (u_pair_array(per_dist_array(new_pos, others, size), table) -
+            u_pair_array(per_dist_array(conf[i], others, size), table))
+
+
+# total energy of the configuration
+def total_energy(conf, size, table=None):
+    return sum([np.sum(u_pair_array(per_dist_array(conf[i], conf[i + 1:], size), table))
+                for i in range(len(conf) - 1)])
+
+
+# long-range part of u_lj (pairs at distance r >= r_c)
+def u_long_array(r, r_c):
+    return np.where(r >= r_c, u_lj_array(r), 0.0)
+
+
+# variation of the long-range energy when the particles in moved are displaced from old_pos to their positions in
+# conf, together with the number of long-range pair energies evaluated (each pair of moved particles is counted twice)
+def long_range_delta_u(conf, moved, old_pos, r_c, size):
+    new_pos = conf[moved]
+    others = np.delete(conf, moved, axis=0)
+    # moved particles against the particles that have not been moved
+    r_new = per_dist_array(new_pos[:, None, :], others[None, :, :], size)
+    r_old = per_dist_array(old_pos[:, None, :], others[None, :, :], size)
+    # pairs of moved particles
+    [i, j] = np.triu_indices(len(moved), 1)
+    r_new_moved = per_dist_array(new_pos[i], new_pos[j], size)
+    r_old_moved = per_dist_array(old_pos[i], old_pos[j], size)
+    delta_u = (np.sum(u_long_array(r_new, r_c)) - np.sum(u_long_array(r_old, r_c)) +
+               np.sum(u_long_array(r_new_moved, r_c)) - np.sum(u_long_array(r_old_moved, r_c)))
+    n_evals = (np.count_nonzero(r_new >= r_c) + np.count_nonzero(r_old >= r_c) +
+               2 * (np.count_nonzero(r_new_moved >= r_c) + np.count_nonzero(r_old_moved >= r_c)))
+    return [float(delta_u), int(n_evals)]
+
+
+# r on one branch ('inner' or 'outer') of the tabulated potential with table_u(r) = target, for an array of targets
+# (see table_root in functions.py, whose Newton iterations are repeated here, so that the roots are the same). The roots
+# are NaN for the targets below the minimum of the potential, as the roots of u_lj in r_disp_array.
+def table_root_array(table, branch, target):
+    segment = table[branch]
+    sign = -1.0 if branch == 'inner' else 1.0
+    keys = segment['key_array']
+    roots = np.full(np.shape(target), np.nan)
+    inside = (sign * target >= keys[0]) & (sign * target <= keys[-1])
+    # beyond the table, the roots are found one by one by table_root
+    beyond = (sign * target < keys[0]) if branch == 'inner' else (sign * target > keys[-1])
+    roots[beyond] = [table_root(table, branch, value) for value in target[beyond]]
+    k = np.minimum(np.searchsorted(keys, sign * target[inside], side='right') - 1, segment['n'] - 1)
+    [c0, c1, c2, c3] = segment['array'][k].T
+    value = target[inside]
+    next_value = c0 + c1 + c2 + c3
+    [t_lo, t_hi] = [np.zeros(len(k)), np.ones(len(k))]
+    with np.errstate(all='ignore'):
+        t = np.where(next_value != c0, (value - c0) / (next_value - c0), 0.5)
+        active = np.ones(len(k), dtype=bool)
+        for iteration in range(100):
+            f = c0 + t * (c1 + t * (c2 + t * c3)) - value
+            active &= f != 0.0
+            t_hi = np.where(active & (sign * f > 0.0), t, t_hi)
+            t_lo = np.where(active & (sign * f <= 0.0), t, t_lo)
+            df = c1 + t * (2.0 * c2 + 3.0 * t * c3)
+            t_new = np.where(df != 0.0, t - f / df, t_lo - 1.0)
+            t_new = np.where((t_lo < t_new) & (t_new < t_hi), t_new, 0.5 * (t_lo + t_hi))
+            active &= t_new != t
+            if not active.any():
+                break
+            t = np.where(active, t_new, t)
+    roots[inside] = segment['r_lo'] + (k + t) * segment['h']
+    return roots
+
+
+# r-displacements producing a variation delta_u in u_lj (or in the tabulated potential, if table is given), starting
+# from r0 (the two values returned by r_disp, or by table_r_disp)
+def r_disp_array(r0, delta_u, table=None):
+    if table is not None:
+        target = table_u_array(table, np.broadcast_to(r0, np.shape(delta_u))) + delta_u
+        return [table_root_array(table, 'outer', target), table_root_array(table, 'inner', target)]
+    root = np.sqrt(1.0 + (u_lj_array(r0) + delta_u) / epsilon)
+    r1 = np.where(1.0 - root > 0.0, (0.5 * (1.0 - root)) ** (-1 / 6), -1.0)
+    r2 = (0.5 * (1.0 + root)) ** (-1 / 6)
+    return [np.where(1.0 - root == 0.0, 1.0, r1), np.where(1.0 - root == 0.0, np.inf, r2)]
+
+
+# largest r-displacement, corresponding to max(r_disp(r0, delta_u))
+def r_disp_max(r0, delta_u, table=None):
+    return np.maximum(*r_disp_array(r0, delta_u, table))
+
+
+# smallest positive r-displacement, corresponding to min(r_disp(r0, delta_u)) if it is positive, max(...) otherwise
+def r_disp_min(r0, delta_u, table=None):
+    [r1, r2] = r_disp_array(r0, delta_u, table)
+    return np.where(np.minimum(r1, r2) > 0.0, np.minimum(r1, r2), np.maximum(r1, r2))
+
+
+# values x_lefts where branch is True, and previous_x_lefts elsewhere
+def select_branch(branch, x_lefts, previous_x_lefts):
+    return [np.where(branch, x, x_previous) for x, x_previous in zip(x_lefts, previous_x_lefts)]
+
+
+# x-displacements of active_particle producing variations delta_us in u_lj with respect to each of the
+# target_particles. This is the batched version of displacement_advanced, which is kept in functions.py as a
+# reference: every branch of the scalar function that is needed by at least one target particle is evaluated for all
+# of them, and the relevant one is selected afterwards. If table is given (see potential_table in functions.py), the
+# tabulated potential is used instead of u_lj.
+def displacement_advanced_array(active_particle, target_particles, delta_us, size, n_min=n_batch_min, table=None):
+    if len(target_particles) < n_min:
+        return np.array([displacement_advanced(active_particle, target_particle, delta_u, size, table)
+                         for target_particle, delta_u in zip(target_particles, delta_us)])
+    active_particle = np.asarray(active_particle, dtype=float)
+    target_particles = np.asarray(target_particles, dtype=float).reshape(-1, 2)
+    delta_us = np.asarray(delta_us, dtype=float)
+    target_x = target_particles[:, 0]
+    y_row = np.full(len(target_particles), active_particle[1])
+    # positions on the row of the active particle: facing the target, opposite to it, and in the potential well
+    pos_min = np.column_stack([target_x, y_row])
+    pos_max = np.column_stack([(target_x + size / 2) % size, y_row])
+    pos_move = np.column_stack([np.full(len(target_particles), (active_particle[0] + 10 ** (-3)) % size), y_row])
+    r_min = per_dist_array(pos_min, target_particles, size)
+    r_max = per_dist_array(pos_max, target_particles, size)
+    r0 = per_dist_array(active_particle, target_particles, size)
+    r_well = 2 ** (1 / 6) * sigma if table is None else table['r_well']
+    with np.errstate(all='ignore'):
+        delta_y = per_dist_array(y_row[:, None], target_particles[:, 1:], size)
+        pos_well = np.column_stack([(target_x + np.sqrt(r_well ** 2 - delta_y ** 2)) % size, y_row])
+        # x-distances between the target particle and the active particle, or one of the above positions
+        dx_active = per_dist_array(active_particle[None, :1], target_particles[:, :1], size)
+        dx_max = per_dist_array(pos_max[:, :1], target_particles[:, :1], size)
+        dx_well = per_dist_array(pos_well[:, :1], target_particles[:, :1], size)
+        dx_min = np.zeros(len(target_particles))
+
+        # vectorized x_disp, starting from the x-distance dx_0
+        def x_disp_array(dx_0, r_final):
+            dx_final = np.where(delta_y <= r_final, np.sqrt(r_final ** 2 - delta_y ** 2), 0.0)
+            return np.abs(dx_final - dx_0)
+
+        # variation of u_lj over a period
+        [u_min, u_max, u_well, u0] = [u_pair_array(r, table) for r in [r_min, r_max, np.full(len(r0), r_well), r0]]
+        delta_u_period = np.where((r_min > r_well) | (r_max < r_well), np.abs(u_min - u_max),
+                                  np.abs(u_min - u_well) + np.abs(u_max - u_well))
+        n_periods = np.trunc(delta_us / delta_u_period)
+        # remaining variation of u_lj
+        u_left = delta_us - delta_u_period * n_periods
+        r_move = per_dist_array(pos_move, target_particles, size)
+        moving_away = r_move > r0
+        zero = np.zeros(len(target_particles))
+        half = np.full(len(target_particles), size / 2)
+        [x_left1, x_left2, x_left3, x_left4] = [zero, zero, zero, zero]
+        well = (r_min < r_well) & (r_well < r_max)
+        # r_min >= r_well, moving away
+        branch = (r_min >= r_well) & moving_away
+        if branch.any():
+            r = r_disp_max(r0, u_left, table)
+            direct = (r0 <= r) & (r <= r_max)
+            r_1 = r_disp_max(r_min, u_left - (u_max - u0), table)
+            x_lefts = [np.where(direct, x_disp_array(dx_active, r), x_disp_array(dx_active, r_max)),
+                       np.where(direct, zero, half), np.where(direct, zero, x_disp_array(dx_min, r_1)), zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_min >= r_well, moving towards the target
+        branch = (r_min >= r_well) & ~moving_away
+        if branch.any():
+            x_lefts = [x_disp_array(dx_active, r_min), x_disp_array(dx_min, r_disp_max(r_min, u_left, table)), zero,
+                       zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_max <= r_well, moving away (this case never occurs if the box is big enough)
+        branch = (r_max <= r_well) & moving_away
+        if branch.any():
+            x_lefts = [x_disp_array(dx_active, r_max), x_disp_array(dx_max, r_disp_min(r_max, u_left, table)), zero,
+                       zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_max <= r_well, moving towards the target
+        branch = (r_max <= r_well) & ~moving_away
+        if branch.any():
+            r = r_disp_min(r0, u_left, table)
+            direct = (r_min <= r) & (r <= r0)
+            r_1 = r_disp_min(r_max, u_left - (u_min - u0), table)
+            x_lefts = [np.where(direct, x_disp_array(dx_active, r), x_disp_array(dx_active, r_min)),
+                       np.where(direct, zero, half), np.where(direct, zero, x_disp_array(dx_max, r_1)), zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_min < r_well < r_max, r0 >= r_well, moving away
+        branch = well & (r0 >= r_well) & moving_away
+        if branch.any():
+            r = r_disp_max(r0, u_left, table)
+            direct = (r0 <= r) & (r <= r_max)
+            u_left_1 = u_left - (u_max - u0)
+            r_1 = r_disp_min(r_well, u_left_1, table)
+            direct_1 = (r_min < r_1) & (r_1 < r_well)
+            r_2 = r_disp_max(r_well, u_left_1 - (u_min - u_well), table)
+            x_lefts = [np.where(direct, x_disp_array(dx_active, r), x_disp_array(dx_active, r_max)),
+                       np.where(direct, zero, x_disp_array(dx_max, r_well)),
+                       np.where(direct, zero, np.where(direct_1, x_disp_array(dx_well, r_1),
+                                                       2 * x_disp_array(dx_well, r_min))),
+                       np.where(direct | direct_1, zero, x_disp_array(dx_well, r_2))]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_min < r_well < r_max, r0 >= r_well, moving towards the target
+        branch = well & (r0 >= r_well) & ~moving_away
+        if branch.any():
+            r = r_disp_min(r_well, u_left, table)
+            direct = (r_min <= r) & (r <= r_well)
+            r_1 = r_disp_max(r_well, u_left - (u_min - u_well), table)
+            x_lefts = [x_disp_array(dx_active, r_well),
+                       np.where(direct, x_disp_array(dx_well, r), 2 * x_disp_array(dx_well, r_min)),
+                       np.where(direct, zero, x_disp_array(dx_well, r_1)), zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_min < r_well < r_max, r0 < r_well, moving away
+        branch = well & (r0 < r_well) & moving_away
+        if branch.any():
+            r = r_disp_max(r_well, u_left, table)
+            direct = (r_well <= r) & (r <= r_max)
+            r_1 = r_disp_min(r_well, u_left - (u_max - u_well), table)
+            x_lefts = [x_disp_array(dx_active, r_well),
+                       np.where(direct, x_disp_array(dx_well, r), 2 * x_disp_array(dx_well, r_max)),
+                       np.where(direct, zero, x_disp_array(dx_well, r_1)), zero]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        # r_min < r_well < r_max, r0 < r_well, moving towards the target
+        branch = well & (r0 < r_well) & ~moving_away
+        if branch.any():
+            r = r_disp_min(r0, u_left, table)
+            direct = (r_min <= r) & (r <= r0)
+            u_left_1 = u_left - (u_min - u0)
+            r_1 = r_disp_max(r_well, u_left_1, table)
+            direct_1 = (r_well <= r_1) & (r_1 <= r_max)
+            r_2 = np.minimum(*r_disp_array(r_well, u_left_1 - (u_max - u_well), table))
+            x_lefts = [np.where(direct, x_disp_array(dx_active, r), x_disp_array(dx_active, r_min)),
+                       np.where(direct, zero, x_disp_array(dx_min, r_well)),
+                       np.where(direct, zero, np.where(direct_1, x_disp_array(dx_well, r_1),
+                                                       2 * x_disp_array(dx_well, r_max))),
+                       np.where(direct | direct_1, zero, x_disp_array(dx_well, r_2))]
+            [x_left1, x_left2, x_left3, x_left4] = select_branch(branch, x_lefts, [x_left1, x_left2, x_left3, x_left4])
+        displacements = size * n_periods + (x_left1 + x_left2 + x_left3 + x_left4)
+        displacements = np.where(u_left <= 0.0, size * n_periods, displacements)
+    return np.where(delta_us == 0.0, 0.0, displacements)
+
+
+# number of trials in which each factor belongs to the veto set, for n_trials trials of poisson-veto: factor i is in
+# the veto set if an exponential time of rate intensities[i] is smaller than 1. The trials are sampled in batches of at
+# most n_draws times.
+def naive_veto_counts(intensities, n_trials, rng, n_draws=10 ** 6):
+    intensities = np.asarray(intensities, dtype=float)
+    batch_size = max(n_draws // len(intensities), 1)
+    counts = np.zeros(len(intensities), dtype=np.int64)
+    for first in range(0, n_trials, batch_size):
+        times = rng.exponential(1.0 / intensities, (min(batch_size, n_trials - first), len(intensities)))
+        counts += np.count_nonzero(times < 1.0, axis=0)
+    return counts
+
+
+# number of trials in which each factor belongs to the veto set, for n_trials trials of poisson-veto(patch): the number
+# of events of the Poisson process of total rate lambda_tot in [0, 1] is drawn for all the trials of a batch, the
+# factors of all the events are sampled at once with the Walker tables, and each factor is counted once per trial
+def patch_veto_counts(prob_table, alias_table, lambda_tot, n_trials, rng, n_draws=10 ** 6):
+    [prob_table, alias_table] = [np.asarray(prob_table), np.asarray(alias_table)]
+    n_factors = len(prob_table)
+    batch_size = max(int(n_draws / max(lambda_tot, 1.0)), 1)
+    counts = np.zeros(n_factors, dtype=np.int64)
+    for first in range(0, n_trials, batch_size):
+        n_events = rng.poisson(lambda_tot, min(batch_size, n_trials - first))
+        j = rng.integers(0, n_factors, n_events.sum())
+        factors = np.where(rng.random(len(j)) < prob_table[j], j, alias_table[j])
+        trials = np.repeat(np.arange(len(n_events)), n_events)
+        counts += np.bincount(np.unique(trials * n_factors + factors) % n_factors, minlength=n_factors)
+    return counts
+
+
+# veto set of one trial of poisson-veto(patch), with the Walker tables given as arrays: the number of events of the
+# Poisson process of total rate lambda_tot in [0, 1] is drawn once, and the factors of all the events are sampled at
+# once (one by one if there are fewer than n_min of them). Repeated factors only appear once in the set.
+def patch_veto_set(prob_table, alias_table, lambda_tot, rng, n_min=n_batch_min):
+    n_events = int(rng.poisson(lambda_tot))
+    n_factors = len(prob_table)
+    if n_events < n_min:
+        factors = [int(random.random() * n_factors) for m in range(n_events)]
+        return {j if random.random() < prob_table[j] else int(alias_table[j]) for j in factors}
+    j = rng.integers(0, n_factors, n_events)
+    return set(np.where(rng.random(n_events) < prob_table[j], j, alias_table[j]).tolist())